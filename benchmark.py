@@ -0,0 +1,194 @@
+"""
+Synthetic-data benchmark for every pipeline stage.
+
+Generates a PFP export and a Workbook Structure workbook at the requested scale, lays
+them out in a local SharePoint stand-in, runs each stage against it and appends wall
+time, peak RSS and rows/second per stage to a JSON-lines results file.
+
+    python benchmark.py --rows 10000 100000 1000000 --duplicate-rate 0.1 --repeat 3
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from instrumentation import current_rss
+
+
+DEFAULT_RESULTS_FILE = "benchmark_results.jsonl"
+
+
+class PeakRssSampler:
+    """Samples RSS on a background thread while a stage runs and keeps the peak."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.start_rss = self.peak_rss = current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, current_rss())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, current_rss())
+
+
+def run_stage(name, func, rows_of=len):
+    """Runs func() with its stdout silenced and returns (result, metrics)."""
+    with PeakRssSampler() as sampler, open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        try:
+            result, status, error = func(), "ok", None
+        except Exception as e:
+            result, status, error = None, "error", f"{type(e).__name__}: {e}"
+        wall = time.perf_counter() - start
+    rows = rows_of(result) if result is not None and rows_of else None
+    return result, {
+        "stage": name,
+        "status": status,
+        "error": error,
+        "wall_s": round(wall, 4),
+        "rows": rows,
+        "rows_per_s": round(rows / wall, 1) if rows and wall > 0 else None,
+        "peak_rss_mb": round(sampler.peak_rss / 2**20, 1),
+        "rss_delta_mb": round((sampler.peak_rss - sampler.start_rss) / 2**20, 1),
+    }
+
+
+def benchmark_pipeline(work_dir, rows, duplicate_rate, seed):
+    """Generates inputs for one scale and runs every stage once. Returns the list of stage metrics."""
+    import pipeline
+    from download_cache import DownloadCache
+    from gba_classification import split_by_gba
+    from gba_publisher import publish_workbooks
+    from jobs import get_frame_cache
+    from pfp_delta import RowDigest
+    from pfp_sidecar import upload_sidecar
+    from resource_index import ResourceIndex
+    from sharepoint_session import LocalSharePointSession
+    from synthetic_data import generate_checker, generate_pfp, write_local_sharepoint
+
+    root = os.path.join(work_dir, "sharepoint")
+    shutil.rmtree(root, ignore_errors=True)
+    pfp, employees = generate_pfp(rows, duplicate_rate=duplicate_rate, seed=seed)
+    checker = generate_checker(employees, seed=seed)
+    pfp_path = write_local_sharepoint(root, pfp, checker, pipeline.PFP_FOLDER, pipeline.WORKBOOK_STRUCTURE_FOLDER,
+                                      extra_folders=[pipeline.OLD_PFP_FOLDER, pipeline.GBA_FOLDER])
+    # Cold download and frame caches for every run so fetch stages measure transfer + parse
+    pipeline.get_download_cache = lambda cache=DownloadCache(os.path.join(work_dir, "downloads")): cache
+    pipeline.get_download_cache().clear()
+    get_frame_cache().clear()
+    session = LocalSharePointSession(root)
+    metrics = []
+
+    def stage(name, func, rows_of=len):
+        result, m = run_stage(name, func, rows_of)
+        metrics.append(m)
+        return result
+
+    if pfp_path:
+        raw = stage("fetch_pfp", lambda: pipeline.fetch_file_from_sharepoint_folder(
+            None, pipeline.PFP_FOLDER, None, None, session=session, list_subfolders=False)[1])
+    else:
+        metrics.append({"stage": "fetch_pfp", "status": "skipped", "error": "export exceeds one Excel sheet"})
+        raw = pfp
+    if raw is None:
+        return metrics
+    if pfp_path:
+        # Low-memory mode (PipelineRun with low_memory): the export is already in the download cache, so this is the streamed parse + clean
+        stage("fetch_clean_pfp_streaming", lambda: pipeline.first_time_run_pfp_streaming(pipeline.fetch_pfp_chunks_from_sharepoint_folder(
+            None, pipeline.PFP_FOLDER, None, None, session=session)[1]))
+    cleaned = stage("clean_pfp", lambda: pipeline.first_time_run_pfp(raw.copy()))
+    stage("clean_pfp_compact", lambda: pipeline.first_time_run_pfp(raw.copy(), compact=True))
+    snapshot_name = f"Project Plan Analysis-continuous-{datetime.now().strftime('%Y-%m-%d')}.xlsx"
+    if cleaned is not None and len(cleaned) <= 1_048_575:
+        stage("publish_snapshot", lambda: pipeline.upload_dataframe_to_sharepoint_folder(
+            None, pipeline.OLD_PFP_FOLDER, snapshot_name, cleaned, None, None, session=session) and cleaned, len)
+    else:
+        metrics.append({"stage": "publish_snapshot", "status": "skipped", "error": "snapshot exceeds one Excel sheet"})
+    if cleaned is not None:
+        stage("publish_sidecar", lambda: upload_sidecar(session, pipeline.OLD_PFP_FOLDER, snapshot_name, cleaned, digest=RowDigest.of(cleaned)) and cleaned)
+    # An incremental run against the snapshot just published: the unchanged export is the worst case for the diff
+    digest = stage("load_snapshot_digest", lambda: pipeline.fetch_latest_pfp_digest(None, pipeline.OLD_PFP_FOLDER, None, None, session=session))
+    if digest is not None:
+        stage("clean_pfp_incremental", lambda: pipeline.first_time_run_pfp_delta(raw.copy(), digest), rows_of=lambda r: len(r[0]))
+    latest = stage("load_snapshot", lambda: pipeline.fetch_latest_pfp_for_employee_remapping_to_create_gba_from_old_pfp(
+        None, pipeline.OLD_PFP_FOLDER, None, None, session=session))
+    checker_clean = stage("load_checker", lambda: pipeline.fetch_and_clean_checker_from_sharepoint(
+        pipeline.fetch_workbook_from_sharepoint_folder(None, pipeline.WORKBOOK_STRUCTURE_FOLDER, None, None, session=session)[1])[1])
+    if latest is None or checker_clean is None:
+        return metrics
+    # The Checker lookup PipelineRun.merge uses: the index is built once per workbook version, then enrich()
+    resource_index = stage("build_resource_index", lambda: ResourceIndex.from_checker(checker_clean))
+    if resource_index is None:
+        return metrics
+    merged = stage("merge", lambda: pipeline.merge_pfp_with_checker(latest, resource_index))
+    if merged is None:
+        return metrics
+    split = stage("classify", lambda: split_by_gba(merged), rows_of=lambda r: sum(len(df) for df in r.values()))
+    if split is not None:
+        gba_frames = {f"CPW_Tool_{key}_Main.xlsx": df for key, df in split.items()}
+        stage("publish_gba", lambda: publish_workbooks(session, pipeline.GBA_FOLDER, gba_frames),
+              rows_of=lambda r: sum(len(df) for df in gba_frames.values()))
+    return metrics
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the PFP/GBA pipeline stages on synthetic data.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000], help="PFP export sizes to run (10k to 5M)")
+    parser.add_argument("--duplicate-rate", type=float, default=0.1, help="fraction of rows repeating an earlier Unique Code")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per scale")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=DEFAULT_RESULTS_FILE, help="JSON-lines results file (appended)")
+    parser.add_argument("--work-dir", help="where to generate inputs (default: a temporary directory)")
+    args = parser.parse_args(argv)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="wfp-bench-")
+    run_info = {
+        "run_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+    }
+    try:
+        with open(args.output, "a") as out:
+            for rows in args.rows:
+                for repeat in range(args.repeat):
+                    for m in benchmark_pipeline(work_dir, rows, args.duplicate_rate, args.seed + repeat):
+                        record = dict(run_info, scale_rows=rows, duplicate_rate=args.duplicate_rate, repeat=repeat, **m)
+                        out.write(json.dumps(record) + "\n")
+                        out.flush()
+                        print(f"{rows:>9} rows  {m['stage']:<25} {m['status']:<7} "
+                              f"{m.get('wall_s') or 0:>8.2f}s  peak {m.get('peak_rss_mb') or 0:>7.1f} MB  "
+                              f"{m.get('rows_per_s') or 0:>12,.0f} rows/s")
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    print(f"Results appended to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
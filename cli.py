@@ -0,0 +1,151 @@
+"""
+Headless entry point for scheduled and container runs of the pipeline.
+
+    python cli.py first-run --incremental
+    python cli.py gba
+    python cli.py all --pfp-folder "/teams/Other/Shared Documents/PFP" --trace run.jsonl
+    python cli.py all --dry-run
+    python cli.py gba --as-of 2024-06-30
+    python cli.py rebuild-manifest
+
+Stages: 'first-run' cleans the PFP export and publishes the OLD PFP snapshot, 'gba'
+builds and publishes the GBA workbooks from the latest snapshot, 'all' runs both in
+that order and stops at the first failure. Both run on one pipeline.PipelineRun, so with
+'all' the GBA workbooks are built from the cleaned PFP in memory. 'rebuild-manifest' rewrites the OLD PFP
+snapshot manifest from a full folder listing when it is missing or stale.
+Pandas, Office365 and the pipeline modules are only imported once a stage actually
+runs, so --help and --dry-run return quickly.
+
+Exit status: 0 when every requested stage succeeded, 2 for invalid arguments, 3 for an
+invalid configuration, otherwise the sum of STAGE_EXIT_CODES over the stages that failed
+or were not reached (first-run = 4, gba = 8, rebuild-manifest = 16).
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import config
+
+
+STAGES = ("first-run", "gba")
+STAGE_EXIT_CODES = {"first-run": 4, "gba": 8, "rebuild-manifest": 16}
+EXIT_INVALID_CONFIG = 3
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Run the PFP / GBA pipeline stages without the Streamlit UI.")
+    parser.add_argument("stage", choices=STAGES + ("all", "rebuild-manifest"), help="stage to run; 'all' chains first-run and gba")
+    parser.add_argument("--site-url", default=config.SITE_URL, help="SharePoint site URL")
+    parser.add_argument("--pfp-folder", default=config.PFP_FOLDER, help="folder holding the Oracle PFP export")
+    parser.add_argument("--old-pfp-folder", help="folder for the cleaned snapshots (default: <pfp-folder>/OLD PFP)")
+    parser.add_argument("--workbook-structure-folder", default=config.WORKBOOK_STRUCTURE_FOLDER, help="folder holding the Workbook Structure .xlsm")
+    parser.add_argument("--gba-folder", default=config.GBA_FOLDER, help="folder receiving the CPW_Tool_<GBA>_Main.xlsx workbooks")
+    parser.add_argument("--low-memory", action="store_true", help="first-run: stream the export, keeping only the GBA columns")
+    parser.add_argument("--incremental", action="store_true", help="first-run: only re-clean rows changed since the latest snapshot")
+    parser.add_argument("--compact", action="store_true", help="first-run: categorical columns and integer keys")
+    parser.add_argument("--as-of", metavar="YYYY-MM-DD", help="gba: use the latest snapshot dated on or before this day")
+    parser.add_argument("--trace", metavar="FILE", help="append the per-stage spans to this JSON-lines file")
+    parser.add_argument("--verbosity", type=int, choices=(0, 1, 2), help="0 = errors and warnings only, 1 = progress (default), 2 = DataFrame previews")
+    parser.add_argument("--dry-run", action="store_true", help="validate the configuration and print the plan without running anything")
+    return parser
+
+
+def validate(args):
+    """Returns a list of configuration problems; empty when the stages can run."""
+    problems = []
+    if not args.site_url.startswith(("https://", "http://")):
+        problems.append(f"--site-url must be an http(s) URL, got '{args.site_url}'")
+    for option in ("pfp_folder", "old_pfp_folder", "workbook_structure_folder", "gba_folder"):
+        value = getattr(args, option)
+        if not value.startswith("/"):
+            problems.append(f"--{option.replace('_', '-')} must be a server-relative path starting with '/', got '{value}'")
+    if not os.getenv("SHAREPOINT_LOCAL_ROOT") and not (os.getenv("CLIENT_ID") and os.getenv("CLIENT_SECRET")):
+        problems.append("CLIENT_ID and CLIENT_SECRET must be set (environment or .env)")
+    if args.as_of:
+        try:
+            datetime.strptime(args.as_of, "%Y-%m-%d")
+        except ValueError:
+            problems.append(f"--as-of must be a YYYY-MM-DD date, got '{args.as_of}'")
+    if args.low_memory and args.incremental:
+        problems.append("--low-memory and --incremental cannot be combined")
+    return problems
+
+
+def new_pipeline_run(args):
+    from pipeline import PipelineRun
+
+    return PipelineRun(site_url=args.site_url, pfp_folder=args.pfp_folder, old_pfp_folder=args.old_pfp_folder,
+                       workbook_structure_folder=args.workbook_structure_folder, gba_folder=args.gba_folder,
+                       low_memory=args.low_memory, incremental=args.incremental, compact=args.compact, as_of=args.as_of)
+
+
+def run_stage(stage, args, pipeline_run=None):
+    """Runs one stage (on pipeline_run for first-run and gba) and returns (ok, messages)."""
+    if stage == "rebuild-manifest":
+        from sharepoint_session import get_sharepoint_session
+        from snapshot_manifest import rebuild_manifest
+
+        session = get_sharepoint_session(args.site_url, os.getenv("CLIENT_ID"), os.getenv("CLIENT_SECRET"))
+        manifest = rebuild_manifest(session, args.old_pfp_folder)
+        return True, [("success", f"Snapshot manifest rebuilt with {len(manifest['snapshots'])} snapshot(s), latest {manifest['latest']}")]
+
+    from pipeline import FIRST_RUN_STAGES, GBA_STAGES
+
+    ok, messages = pipeline_run.run(FIRST_RUN_STAGES if stage == "first-run" else GBA_STAGES)
+    return ok and not any(level == "error" for level, _ in messages), messages
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.old_pfp_folder is None:
+        args.old_pfp_folder = config.OLD_PFP_FOLDER if args.pfp_folder == config.PFP_FOLDER else args.pfp_folder + "/OLD PFP"
+    stages = STAGES if args.stage == "all" else (args.stage,)
+
+    problems = validate(args)
+    if problems:
+        for problem in problems:
+            print(f"Invalid configuration: {problem}", file=sys.stderr)
+        return EXIT_INVALID_CONFIG
+    if args.dry_run:
+        print(f"Would run {', '.join(stages)} against {os.getenv('SHAREPOINT_LOCAL_ROOT') or args.site_url}")
+        for option in ("pfp_folder", "old_pfp_folder", "workbook_structure_folder", "gba_folder"):
+            print(f"  {option}: {getattr(args, option)}")
+        return 0
+
+    from instrumentation import set_verbosity, tracer
+
+    if args.verbosity is not None:
+        set_verbosity(args.verbosity)
+    exit_code = 0
+    summary = []
+    pipeline_run = None
+    for i, stage in enumerate(stages):
+        tracer.reset()
+        start = time.perf_counter()
+        try:
+            with tracer.span(stage):
+                if stage != "rebuild-manifest" and pipeline_run is None:
+                    pipeline_run = new_pipeline_run(args)
+                ok, messages = run_stage(stage, args, pipeline_run)
+        except Exception as e:
+            ok, messages = False, [("error", f"{type(e).__name__}: {e}")]
+        if args.trace:
+            tracer.export_jsonl(args.trace)
+        summary.append((stage, "ok" if ok else "failed", time.perf_counter() - start, messages))
+        if not ok:
+            # Later stages depend on this one's output, so they are not attempted
+            exit_code = sum(STAGE_EXIT_CODES[s] for s in stages[i:])
+            summary.extend((s, "skipped", 0.0, []) for s in stages[i + 1:])
+            break
+
+    for stage, status, elapsed, messages in summary:
+        print(f"{stage:<16} {status:<8} {elapsed:8.2f}s")
+        for level, text in messages:
+            print(f"  [{level}] {text}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
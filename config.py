@@ -0,0 +1,16 @@
+import os
+
+from dotenv import load_dotenv
+
+
+# Before any setting below is read, so the WFP_* values in .env override the defaults too
+load_dotenv()
+
+# SharePoint locations used by the app and the CLI; the WFP_* environment variables override them
+SITE_URL = os.getenv("WFP_SITE_URL", "https://arcadiso365.sharepoint.com/teams/CPW_Testing")
+PFP_FOLDER = os.getenv("WFP_PFP_FOLDER", "/teams/CPW_Testing/Shared Documents/PLA CAN CPW Tool/CPW FINAL PACKAGE/01 Data Processing/Project Financial Plan (PFP)")
+OLD_PFP_FOLDER = os.getenv("WFP_OLD_PFP_FOLDER", PFP_FOLDER + "/OLD PFP")
+WORKBOOK_STRUCTURE_FOLDER = os.getenv("WFP_WORKBOOK_STRUCTURE_FOLDER", "/teams/CPW_Testing/Shared Documents/PLA CAN CPW Tool/CPW FINAL PACKAGE/01 Data Processing/Workbook Structure")
+GBA_FOLDER = os.getenv("WFP_GBA_FOLDER", "/teams/CPW_Testing/Shared Documents/PLA CAN CPW Tool/CPW FINAL PACKAGE/02 GBA Workbooks")
+# Output level of instrumentation.info/debug (0-2, see instrumentation.VERBOSITY)
+VERBOSITY = int(os.getenv("WFP_VERBOSITY", "1"))
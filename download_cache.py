@@ -0,0 +1,117 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "workforce_planning", "downloads")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class DownloadCache:
+    """
+    On-disk cache in front of SharePoint downloads.
+
+    Entries are keyed by server-relative URL plus the file's ETag/TimeLastModified, so
+    a changed file on the server is simply a new key and stale entries age out.
+    Total size is bounded by max_bytes with least-recently-used eviction.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size, least recently used first
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "bytes_saved": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+        existing = [e for e in os.scandir(cache_dir) if e.is_file() and not e.name.endswith(".tmp")]
+        for entry in sorted(existing, key=lambda e: e.stat().st_mtime):
+            self._entries[entry.name] = entry.stat().st_size
+
+    @property
+    def size(self):
+        return sum(self._entries.values())
+
+    @staticmethod
+    def _key(file_url, file_info):
+        version = f'{file_info.get("ETag")}|{file_info.get("TimeLastModified")}'
+        return hashlib.sha256(f"{file_url}|{version}".encode("utf-8")).hexdigest()
+
+    def fetch(self, session, file_url, file_info=None):
+        """
+        Returns the bytes of file_url, downloading only when the cached copy is missing or stale.
+        file_info is the listing entry for the file (ETag, TimeLastModified); when omitted it is
+        looked up with one metadata request.
+        """
+        if file_info is None or not (file_info.get("ETag") or file_info.get("TimeLastModified")):
+            file_info = session.get_file_properties(file_url)
+        key = self._key(file_url, file_info)
+        path = os.path.join(self.cache_dir, key)
+        with self._lock:
+            cached = key in self._entries
+            if cached:
+                self._entries.move_to_end(key)
+        if cached:
+            try:
+                with open(path, "rb") as f:
+                    content = f.read()
+                os.utime(path)
+                with self._lock:
+                    self.stats["hits"] += 1
+                    self.stats["bytes_saved"] += len(content)
+                return content
+            except OSError:
+                with self._lock:
+                    self._entries.pop(key, None)
+
+        content = session.download(file_url)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.stats["misses"] += 1
+            self._entries[key] = len(content)
+            self._entries.move_to_end(key)
+            self._evict()
+        return content
+
+    def _evict(self):
+        total = self.size
+        while total > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            try:
+                os.remove(os.path.join(self.cache_dir, key))
+            except OSError:
+                pass
+            total -= size
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                try:
+                    os.remove(os.path.join(self.cache_dir, key))
+                except OSError:
+                    pass
+            self._entries.clear()
+
+
+_download_cache = None
+_download_cache_lock = threading.Lock()
+
+
+def get_download_cache():
+    """
+    Returns the process-wide download cache. WFP_CACHE_DIR and WFP_DOWNLOAD_CACHE_MB
+    override the location and size limit.
+    """
+    global _download_cache
+    with _download_cache_lock:
+        if _download_cache is None:
+            cache_dir = os.getenv("WFP_CACHE_DIR")
+            cache_dir = os.path.join(cache_dir, "downloads") if cache_dir else DEFAULT_CACHE_DIR
+            max_mb = os.getenv("WFP_DOWNLOAD_CACHE_MB")
+            max_bytes = int(float(max_mb) * 1024 * 1024) if max_mb else DEFAULT_MAX_BYTES
+            _download_cache = DownloadCache(cache_dir, max_bytes)
+        return _download_cache
@@ -0,0 +1,66 @@
+import math
+import tempfile
+import time
+from datetime import date, datetime
+
+from instrumentation import info, tracer
+
+
+# Serialized workbooks larger than this spill from memory to a temporary file
+SPOOL_MAX_SIZE = 16 * 1024 * 1024
+ROWS_PER_BLOCK = 10_000
+
+
+def write_dataframe_xlsx(df, fileobj, sheet_name="Sheet1"):
+    """
+    Writes df (header + rows, no index) as an .xlsx into fileobj using XlsxWriter's
+    constant_memory mode, which flushes each row to disk as soon as it is written so
+    memory stays flat regardless of the frame size.
+    """
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(fileobj, {"constant_memory": True, "strings_to_urls": False})
+    worksheet = workbook.add_worksheet(sheet_name)
+    header_format = workbook.add_format({"bold": True, "border": 1, "align": "center"})
+    datetime_format = workbook.add_format({"num_format": "yyyy-mm-dd hh:mm:ss"})
+    date_format = workbook.add_format({"num_format": "yyyy-mm-dd"})
+
+    worksheet.write_row(0, 0, [str(col) for col in df.columns], header_format)
+    row_idx = 1
+    for start in range(0, len(df), ROWS_PER_BLOCK):
+        block = df.iloc[start:start + ROWS_PER_BLOCK]
+        # tolist() turns numpy scalars into plain Python values XlsxWriter understands
+        columns = [block[col].tolist() for col in block.columns]
+        for row in zip(*columns):
+            for col_idx, value in enumerate(row):
+                if value is None or (isinstance(value, float) and math.isnan(value)):
+                    continue
+                if isinstance(value, datetime):
+                    if value != value:  # NaT
+                        continue
+                    worksheet.write_datetime(row_idx, col_idx, value.replace(tzinfo=None), datetime_format)
+                elif isinstance(value, date):
+                    worksheet.write_datetime(row_idx, col_idx, value, date_format)
+                elif isinstance(value, (bool, int, float, str)):
+                    worksheet.write(row_idx, col_idx, value)
+                else:
+                    worksheet.write_string(row_idx, col_idx, str(value))
+            row_idx += 1
+    workbook.close()
+
+
+def serialize_dataframe_to_spool(df, file_name=""):
+    """
+    Serializes df to an .xlsx in a spooled temporary file (in memory up to SPOOL_MAX_SIZE,
+    on disk beyond that) and returns (fileobj rewound to 0, size in bytes).
+    Prints the serialize time and throughput.
+    """
+    start = time.perf_counter()
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    with tracer.span("serialize", file=file_name, rows=len(df)) as span:
+        write_dataframe_xlsx(df, spool)
+        size = span.bytes = spool.tell()
+    spool.seek(0)
+    elapsed = time.perf_counter() - start
+    info(f"Serialized '{file_name}' ({len(df)} rows) in {elapsed:.2f}s: {size} bytes, {size / max(elapsed, 1e-9) / 1e6:.1f} MB/s")
+    return spool, size
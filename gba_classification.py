@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from instrumentation import info, traced
+
+
+# Define mapping for suffix categories
+SUFFIX_MAP = {
+    "MOB": ["MOB", "MOBILITY", "Mobility"],
+    "PLA": ["PLA", "PLACES", "Places"],
+    "RES": ["RES", "RESILIENCE"],
+    "EF": ["EF", "Enabling Function", "ENABLING FUNCTION"],
+    "SSC": ["SSC", "SHARED SERVICES", "Shared Services"]
+}
+GBA_KEYS = list(SUFFIX_MAP)
+# Normalized suffix (stripped, upper case) -> GBA key, precomputed once
+SUFFIX_LOOKUP = {value.strip().upper(): key for key, values in SUFFIX_MAP.items() for value in values}
+
+
+def extract_org_suffix(org_names):
+    """
+    Vectorized suffix extraction: the last word of the part before ':' in each
+    'Expenditure Organization Name', e.g. 'CA Org Mobility: Team 3' -> 'Mobility'.
+    """
+    prefix = org_names.astype(str).str.split(":", n=1).str[0].str.strip()
+    return prefix.str.rsplit(" ", n=1).str[-1]
+
+
+def classify_gba(org_names):
+    """
+    Maps each organization name to its GBA key (MOB/PLA/RES/EF/SSC) and returns a
+    categorical Series named 'GBA' aligned with org_names; unmatched and missing
+    names are NaN. Organization names repeat heavily, so the string work runs only
+    on the distinct values and is broadcast back through the factorized codes.
+    """
+    codes, uniques = pd.factorize(org_names)
+    suffixes = extract_org_suffix(pd.Series(uniques, dtype=object))
+    unique_gba = pd.Categorical(suffixes.str.strip().str.upper().map(SUFFIX_LOOKUP), categories=GBA_KEYS)
+    gba_codes = np.where(codes >= 0, unique_gba.codes[codes] if len(uniques) else -1, -1)
+    return pd.Series(pd.Categorical.from_codes(gba_codes, categories=GBA_KEYS), index=org_names.index, name="GBA")
+
+
+@traced("classify", rows_of=lambda groups: sum(len(group) for group in groups.values()))
+def split_by_gba(df, column='Expenditure Organization Name'):
+    """
+    Partitions df by GBA in a single groupby. Returns {GBA key: DataFrame} for every
+    key in SUFFIX_MAP (empty frames for GBAs without rows), preserving row order and index.
+    """
+    gba = classify_gba(df[column])
+    info("Rows per GBA:", gba.value_counts(sort=False).to_dict())
+    groups = dict(tuple(df.groupby(gba, observed=True, sort=False)))
+    return {key: groups[key] if key in groups else df.iloc[0:0] for key in GBA_KEYS}
@@ -0,0 +1,95 @@
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from excel_writer import write_dataframe_xlsx
+from instrumentation import info, tracer
+from upload_fingerprints import UploadFingerprints, dataframe_fingerprint
+
+
+UPLOAD_RETRIES = 2
+# Upload statuses shared with pipeline.upload_dataframe_to_sharepoint_folder: "uploaded" (sent), "unchanged"
+# (the server copy already holds the data, nothing sent) or "failed". Published files need no further upload
+# when results are passed back as previous_results.
+PUBLISHED_STATUSES = ("uploaded", "unchanged")
+
+
+def serialize_dataframe_to_bytes(df):
+    """Serializes df to .xlsx bytes; runs in a worker process so workbooks are built in parallel."""
+    buffer = io.BytesIO()
+    write_dataframe_xlsx(df, buffer)
+    return buffer.getvalue()
+
+
+def _timed_serialize(df):
+    # Worker processes cannot reach the parent's tracer, so the time travels back with the bytes
+    start = time.perf_counter()
+    content = serialize_dataframe_to_bytes(df)
+    return content, time.perf_counter() - start
+
+
+def _upload_with_retry(session, folder_path, file_name, content, retries):
+    for attempt in range(1, retries + 2):
+        try:
+            session.upload_stream(folder_path, file_name, io.BytesIO(content), len(content))
+            return {"status": "uploaded", "error": None, "attempts": attempt, "bytes": len(content)}
+        except Exception as e:
+            print(f"Upload of '{file_name}' failed (attempt {attempt}): {e}")
+            error = str(e)
+            if attempt <= retries:
+                time.sleep(2 ** (attempt - 1))
+    return {"status": "failed", "error": error, "attempts": retries + 1, "bytes": len(content)}
+
+
+def publish_workbooks(session, folder_path, frames, serialize_workers=None, upload_workers=4, retries=UPLOAD_RETRIES, previous_results=None,
+                      skip_unchanged=True, ignore_columns=()):
+    """
+    Serializes and uploads {file_name: DataFrame} as pipelined stages: workbooks are
+    built in a process pool, and each one is handed to a bounded upload thread pool as
+    soon as it is ready, so wall time approaches that of the slowest single workbook.
+
+    With skip_unchanged, frames whose fingerprint (ignoring ignore_columns) matches the
+    server copy recorded in the folder's UploadFingerprints are neither serialized nor
+    uploaded. Failed uploads are retried from the already-serialized bytes. Passing the
+    results of an earlier call as previous_results republishes only the files that were
+    not published then; the others keep their earlier result. Returns {file_name: {"status",
+    "error", "attempts", "bytes"}} in the order of frames, with status "uploaded", "unchanged"
+    or "failed".
+    """
+    previous_results = previous_results or {}
+    pending = {name: df for name, df in frames.items() if previous_results.get(name, {}).get("status") not in PUBLISHED_STATUSES}
+    results = {name: dict(previous_results[name]) for name in frames if name not in pending}
+    start = time.perf_counter()
+    fingerprints, known = {}, None
+    if skip_unchanged and pending:
+        with tracer.span("fingerprint") as span:
+            known = UploadFingerprints.load(session, folder_path)
+            fingerprints = {name: dataframe_fingerprint(df, ignore_columns) for name, df in pending.items()}
+            span.rows = sum(len(df) for df in pending.values())
+        for name, fingerprint in fingerprints.items():
+            if known.unchanged(name, fingerprint):
+                results[name] = {"status": "unchanged", "error": None, "attempts": 0, "bytes": 0}
+        pending = {name: df for name, df in pending.items() if name not in results}
+    if pending:
+        workers = min(len(pending), serialize_workers or os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as cpu_pool, ThreadPoolExecutor(max_workers=upload_workers) as io_pool:
+            serialize_futures = {cpu_pool.submit(_timed_serialize, df): name for name, df in pending.items()}
+            upload_futures = {}
+            for future in as_completed(serialize_futures):
+                name = serialize_futures[future]
+                try:
+                    content, elapsed = future.result()
+                except Exception as e:
+                    print(f"Serializing '{name}' failed: {e}")
+                    results[name] = {"status": "failed", "error": str(e), "attempts": 0, "bytes": 0}
+                    continue
+                tracer.record("serialize", elapsed, file=name, rows=len(pending[name]), bytes=len(content))
+                upload_futures[io_pool.submit(_upload_with_retry, session, folder_path, name, content, retries)] = name
+            for future in as_completed(upload_futures):
+                results[upload_futures[future]] = future.result()
+    if known is not None:
+        known.save({name: fingerprints[name] for name in pending if results[name]["status"] == "uploaded"})
+    unchanged = sum(1 for result in results.values() if result["status"] == "unchanged")
+    info(f"Published {len(pending)} workbook(s) to '{folder_path}' in {time.perf_counter() - start:.2f}s ({unchanged} unchanged)")
+    return {name: results[name] for name in frames}
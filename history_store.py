@@ -0,0 +1,219 @@
+import bisect
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from instrumentation import info, tracer
+from pfp_schema import parquet_safe
+from snapshot_manifest import frame_checksum
+
+
+DEFAULT_HISTORY_DIR = os.path.join(os.path.expanduser("~"), ".local", "share", "workforce_planning", "history")
+DATE_COLUMN = "Snapshot Date"
+PART_SUFFIX = ".parquet"
+
+
+class HistoryStore:
+    """
+    Append-only, date-partitioned Parquet history of the cleaned PFP snapshots ('pfp') and
+    the GBA splits ('gba'), for trend queries across runs:
+
+        <root>/<dataset>/date=2024-06-30[/GBA=MOB]/part-<written at>-<checksum>.parquet
+
+    Parts are never rewritten. Appending a frame identical to the newest part of its
+    partition is a no-op, and when a day is appended again with other content the newest
+    part is the one queries read, so re-running a stage never double counts. Queries pick
+    partitions from the directory names and read only the columns they ask for.
+    """
+
+    def __init__(self, root=DEFAULT_HISTORY_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def append(self, dataset, date, df, **partitions):
+        """
+        Appends df as the snapshot of dataset for date ('YYYY-MM-DD' or a date), under the
+        extra partitions given as keyword arguments (e.g. GBA='MOB'). Returns the path of
+        the new part, or None when the partition already holds this content. Columns mixing
+        Python types are stored as text (see pfp_schema.parquet_safe).
+        """
+        leaf = os.path.join(self.root, dataset, f"date={str(date)[:10]}", *(f"{key}={value}" for key, value in partitions.items()))
+        checksum = frame_checksum(df).split(":", 1)[1][:16]
+        with self._lock:
+            os.makedirs(leaf, exist_ok=True)
+            latest = _latest_part(leaf)
+            if latest is not None and latest.endswith(f"-{checksum}{PART_SUFFIX}"):
+                return None
+            path = os.path.join(leaf, f"part-{datetime.now():%Y%m%dT%H%M%S%f}-{checksum}{PART_SUFFIX}")
+            parquet_safe(df).to_parquet(f"{path}.tmp", index=False)
+            os.replace(f"{path}.tmp", path)
+        return path
+
+    def dates(self, dataset):
+        """Sorted snapshot dates ('YYYY-MM-DD') held for dataset."""
+        base = os.path.join(self.root, dataset)
+        if not os.path.isdir(base):
+            return []
+        return sorted(entry.name[5:] for entry in os.scandir(base) if entry.is_dir() and entry.name.startswith("date="))
+
+    def parts(self, dataset, start=None, end=None, dates=None, **filters):
+        """
+        [(path, {partition: value})] of the newest part of every partition of dataset dated
+        between start and end (inclusive) or in dates, whose partitions match filters
+        (a value or a list of values per partition, e.g. GBA=['MOB', 'PLA']).
+        """
+        selected = []
+        for date in self.dates(dataset):
+            if (start is not None and date < str(start)[:10]) or (end is not None and date > str(end)[:10]):
+                continue
+            if dates is not None and date not in dates:
+                continue
+            selected.extend(_leaf_parts(os.path.join(self.root, dataset, f"date={date}"), {DATE_COLUMN: date}, filters))
+        return selected
+
+    def read(self, dataset, columns=None, start=None, end=None, dates=None, distinct=False, **filters):
+        """
+        The selected parts of dataset as one DataFrame with a 'Snapshot Date' column and one
+        column per partition (e.g. 'GBA'). Only columns are read from the files; a column
+        missing from older parts comes back as missing values. distinct drops repeated rows
+        within each part before they are combined, which is all counting queries need.
+        """
+        frames = []
+        partition_keys = set()
+        for path, values in self.parts(dataset, start, end, dates, **filters):
+            partition_keys.update(values)
+            if columns is None:
+                df = pq.read_table(path).to_pandas()
+            else:
+                present = set(pq.read_schema(path).names)
+                wanted = [col for col in columns if col not in values]
+                df = pq.read_table(path, columns=[col for col in wanted if col in present]).to_pandas()
+                df = df.reindex(columns=wanted)
+            if distinct:
+                df = df.drop_duplicates(ignore_index=True)
+            frames.append(df.assign(**{key: pd.Timestamp(value) if key == DATE_COLUMN else value for key, value in values.items()}))
+        if not frames:
+            return pd.DataFrame(columns=[DATE_COLUMN] + list(filters) + list(columns or []))
+        result = pd.concat(frames, ignore_index=True)
+        for key in partition_keys - {DATE_COLUMN}:
+            result[key] = result[key].astype("category")
+        return result
+
+    def headcount(self, by="GBA", start=None, end=None, dataset="gba", person="Resource", **filters):
+        """
+        Distinct people per snapshot date and group, e.g. by=['GBA', 'Expenditure Organization Name']
+        for departments or by='Department Manager'. Returns a long frame with 'Snapshot Date',
+        the by columns and 'Headcount'.
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        with tracer.span("history_query", query="headcount") as span:
+            df = self.read(dataset, columns=by + [person], start=start, end=end, distinct=True, **filters)
+            span.rows = len(df)
+            counts = df.groupby([DATE_COLUMN] + by, observed=True, sort=True)[person].nunique()
+        return counts.rename("Headcount").reset_index()
+
+    def project_churn(self, start=None, end=None, dataset="pfp", project="Project Number", **filters):
+        """
+        Projects added and removed between consecutive snapshots dated between start and end.
+        Returns one row per snapshot after the first with 'Snapshot Date', 'Projects',
+        'Added' and 'Removed'.
+        """
+        with tracer.span("history_query", query="project_churn") as span:
+            df = self.read(dataset, columns=[project], start=start, end=end, distinct=True, **filters)
+            span.rows = len(df)
+            date_codes, dates = pd.factorize(df[DATE_COLUMN], sort=True)
+            project_codes, projects = pd.factorize(df[project].astype(str).where(df[project].notna()))
+            # Snapshot x project presence matrix; churn is the difference between consecutive rows
+            present = np.zeros((len(dates), len(projects)), dtype=bool)
+            keep = project_codes >= 0
+            present[date_codes[keep], project_codes[keep]] = True
+        return pd.DataFrame({
+            DATE_COLUMN: dates[1:],
+            "Projects": present[1:].sum(axis=1),
+            "Added": (present[1:] & ~present[:-1]).sum(axis=1),
+            "Removed": (~present[1:] & present[:-1]).sum(axis=1),
+        })
+
+    def project_changes(self, start, end, dataset="pfp", project="Project Number", **filters):
+        """
+        The projects in the latest snapshot on or before end but not in the latest on or before
+        start ('added'), and the reverse ('removed'), as a frame with project and 'Change'.
+        """
+        dates = self.dates(dataset)
+        before, after = (_latest_on_or_before(dates, day) for day in (start, end))
+        if after is None:
+            return pd.DataFrame(columns=[project, "Change"])
+        df = self.read(dataset, columns=[project], dates={before, after}, distinct=True, **filters).dropna(subset=[project])
+        # Compared as text, like project_churn, so compact (categorical) and plain snapshots agree
+        projects = df[project].astype(str)
+        old = pd.Index(projects[df[DATE_COLUMN] == pd.Timestamp(before)].unique()) if before else pd.Index([], dtype=object)
+        new = pd.Index(projects[df[DATE_COLUMN] == pd.Timestamp(after)].unique())
+        added, removed = new.difference(old, sort=False), old.difference(new, sort=False)
+        return pd.DataFrame({project: np.concatenate([added.to_numpy(dtype=object), removed.to_numpy(dtype=object)]),
+                             "Change": ["added"] * len(added) + ["removed"] * len(removed)})
+
+
+def _latest_part(leaf):
+    # Part names start with their write time, so the newest sorts last
+    names = [entry.name for entry in os.scandir(leaf) if entry.is_file() and entry.name.endswith(PART_SUFFIX)]
+    return max(names) if names else None
+
+
+def _leaf_parts(directory, values, filters):
+    latest = _latest_part(directory)
+    if latest is not None:
+        return [(os.path.join(directory, latest), values)]
+    parts = []
+    for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+        if not entry.is_dir() or "=" not in entry.name:
+            continue
+        key, value = entry.name.split("=", 1)
+        allowed = filters.get(key)
+        if allowed is not None and value not in ([allowed] if isinstance(allowed, str) else allowed):
+            continue
+        parts.extend(_leaf_parts(entry.path, dict(values, **{key: value}), filters))
+    return parts
+
+
+def _latest_on_or_before(dates, day):
+    position = bisect.bisect_right(dates, str(day)[:10])
+    return dates[position - 1] if position else None
+
+
+def append_history(dataset, date, frames, partition=None):
+    """
+    Appends a frame, or {partition value: frame} under partition (e.g. 'GBA'), to the history
+    store. Returns True on success; the history is not needed by the run itself, so a failure
+    is reported and swallowed.
+    """
+    store = get_history_store()
+    try:
+        with tracer.span("history_append", dataset=dataset) as span:
+            items = frames.items() if partition else [(None, frames)]
+            written = 0
+            for value, df in items:
+                span.rows = (span.rows or 0) + len(df)
+                if store.append(dataset, date, df, **({partition: value} if partition else {})) is not None:
+                    written += 1
+        info(f"History '{dataset}' for {date}: {written} new part(s) in {store.root}")
+        return True
+    except Exception as e:
+        print(f"Error appending to the history store: {e}")
+        return False
+
+
+_history_store = None
+_history_store_lock = threading.Lock()
+
+
+def get_history_store():
+    """Returns the process-wide history store; WFP_HISTORY_DIR overrides its location."""
+    global _history_store
+    with _history_store_lock:
+        if _history_store is None:
+            _history_store = HistoryStore(os.getenv("WFP_HISTORY_DIR", DEFAULT_HISTORY_DIR))
+        return _history_store
@@ -0,0 +1,180 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import config
+
+
+# 0 = errors and warnings only, 1 = progress messages (default), 2 = also DataFrame previews
+VERBOSITY = config.VERBOSITY
+
+
+def set_verbosity(level):
+    global VERBOSITY
+    VERBOSITY = int(level)
+
+
+def info(*parts):
+    """Progress and status output, printed from verbosity 1; errors and warnings use print() and always show."""
+    if VERBOSITY >= 1:
+        print(*parts)
+
+
+def debug(*parts):
+    """
+    Prints only at verbosity 2. Callable parts are invoked lazily, so
+    debug("First 5 rows:", lambda: df.head(5)) costs nothing when previews are off.
+    """
+    if VERBOSITY >= 2:
+        print(*(part() if callable(part) else part for part in parts))
+
+
+def current_rss():
+    """Resident set size of this process in bytes (Linux /proc, falling back to the peak from getrusage)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # Imported here: the resource module does not exist on Windows
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Span:
+    """One timed unit of work. rows, bytes and attrs may be filled in while the span is open."""
+
+    def __init__(self, name, depth=0, **attrs):
+        self.name = name
+        self.depth = depth
+        self.rows = attrs.pop("rows", None)
+        self.bytes = attrs.pop("bytes", None)
+        self.attrs = attrs
+        self.started_at = time.time()
+        self.duration_s = None
+        self.mem_delta_mb = None
+        self.error = None
+
+    def to_record(self):
+        record = {
+            "name": self.name,
+            "depth": self.depth,
+            "started_at": round(self.started_at, 3),
+            "duration_s": round(self.duration_s, 4) if self.duration_s is not None else None,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "mem_delta_mb": self.mem_delta_mb,
+            "error": self.error,
+        }
+        record.update(self.attrs)
+        return record
+
+
+class Tracer:
+    """
+    Collects spans for the current run. Spans opened inside another span on the same
+    thread are nested (depth), spans from worker threads are recorded at depth 0.
+    """
+
+    def __init__(self):
+        self._spans = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def reset(self):
+        with self._lock:
+            self._spans = []
+
+    @contextmanager
+    def span(self, name, **attrs):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        span = Span(name, depth=len(stack), **attrs)
+        with self._lock:
+            self._spans.append(span)
+        stack.append(span)
+        start_rss = current_rss()
+        start = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration_s = time.perf_counter() - start
+            span.mem_delta_mb = round((current_rss() - start_rss) / 2**20, 2)
+            stack.pop()
+
+    def record(self, name, duration_s, **attrs):
+        """Adds an already-measured span, e.g. work timed inside a worker process."""
+        span = Span(name, **attrs)
+        span.duration_s = duration_s
+        with self._lock:
+            self._spans.append(span)
+        return span
+
+    def records(self):
+        with self._lock:
+            return [span.to_record() for span in self._spans]
+
+    def to_frame(self, records=None):
+        """Spans as a DataFrame; records defaults to the current run (or pass a saved records() list)."""
+        import pandas as pd
+
+        return pd.DataFrame(self.records() if records is None else records)
+
+    def to_jsonl(self, records=None):
+        records = self.records() if records is None else records
+        return "".join(json.dumps(record, default=str) + "\n" for record in records)
+
+    def export_jsonl(self, path, records=None):
+        """Appends the recorded spans to a JSON-lines file."""
+        with open(path, "a") as f:
+            f.write(self.to_jsonl(records))
+
+
+tracer = Tracer()
+
+
+def round_trip(operation, bytes_arg=None):
+    """
+    Decorator for SharePoint session methods: records a 'sharepoint.<operation>' span per call.
+    bytes_arg is the index of the positional argument holding the uploaded content or size;
+    downloads are measured from the returned bytes.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with tracer.span(f"sharepoint.{operation}", target=args[0] if args else None) as span:
+                if bytes_arg is not None and len(args) > bytes_arg:
+                    value = args[bytes_arg]
+                    span.bytes = value if isinstance(value, int) else len(value)
+                result = func(self, *args, **kwargs)
+                if isinstance(result, (bytes, bytearray)):
+                    span.bytes = len(result)
+                return result
+        return wrapper
+    return decorator
+
+
+def traced(name, rows_of=len):
+    """
+    Decorator recording a span around each call; rows is taken from the result with rows_of
+    (len by default, ignored when the result has no length).
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name) as span:
+                result = func(*args, **kwargs)
+                try:
+                    span.rows = rows_of(result) if result is not None else None
+                except (TypeError, IndexError):
+                    pass
+                return result
+        return wrapper
+    return decorator
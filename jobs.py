@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from instrumentation import info, tracer
+
+
+# A chained pipeline run memoizes seven stage outputs; room for that plus a GBA-only run
+DEFAULT_FRAME_CACHE_ENTRIES = 12
+
+
+def source_identity(file_info):
+    """Identity of a file from its listing entry; any change to the file on the server changes it."""
+    return (file_info.get("ServerRelativeUrl"), file_info.get("ETag"), file_info.get("TimeLastModified"), file_info.get("Length"))
+
+
+def _shallow_copy(value):
+    # Callers may add columns to what they get back; with copy-on-write a shallow copy keeps the cached frame intact
+    if isinstance(value, pd.DataFrame):
+        return value.copy(deep=False)
+    if isinstance(value, tuple):
+        return tuple(_shallow_copy(item) for item in value)
+    if isinstance(value, dict):
+        return {key: _shallow_copy(item) for key, item in value.items()}
+    return value
+
+
+class FrameCache:
+    """
+    In-memory LRU of parsed and cleaned frames shared by all sessions of the server process.
+
+    Keys combine the stage name, the source_identity of every input file and the options
+    the result depends on, so a changed file on the server is a new key and stale entries
+    age out. Holds at most max_entries results.
+    """
+
+    def __init__(self, max_entries=DEFAULT_FRAME_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get_or_compute(self, key, compute):
+        """Returns the cached result for key, or stores and returns compute(). A key of None bypasses the cache."""
+        if key is None:
+            return compute()
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return _shallow_copy(self._entries[key])
+        value = compute()
+        with self._lock:
+            self.stats["misses"] += 1
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+        return _shallow_copy(value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class Job:
+    """One background run. status is 'queued', 'running', 'done' or 'failed'."""
+
+    def __init__(self, key, label):
+        self.key = key
+        self.label = label
+        self.status = "queued"
+        self.progress = []
+        self.result = None
+        self.error = None
+        self.trace = []
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def done(self):
+        return self.status in ("done", "failed")
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    @property
+    def last_progress(self):
+        if self.status == "queued":
+            return "Waiting for another run to finish..."
+        return self.progress[-1] if self.progress else "Starting..."
+
+
+_current = threading.local()
+
+
+def report_progress(message):
+    """Records a progress message on the job running on this thread (and prints it, see instrumentation.info)."""
+    info(message)
+    job = getattr(_current, "job", None)
+    if job is not None:
+        job.progress.append(message)
+
+
+class JobRunner:
+    """
+    Runs jobs on a background worker so the Streamlit script thread never blocks.
+
+    Submitting a key that already has a queued or running job returns that job instead of
+    starting another, so repeated clicks and other users asking for the same work share
+    one run. With the default single worker jobs run one at a time, which also keeps the
+    per-run trace free of other jobs' spans.
+    """
+
+    def __init__(self, max_workers=1):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="wfp-job")
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def submit(self, key, label, func, *args, **kwargs):
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and not job.done:
+                return job
+            job = self._jobs[key] = Job(key, label)
+        self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def get(self, key):
+        with self._lock:
+            return self._jobs.get(key)
+
+    def _run(self, job, func, args, kwargs):
+        _current.job = job
+        job.status = "running"
+        job.started_at = time.time()
+        tracer.reset()
+        try:
+            with tracer.span(job.label):
+                job.result = func(*args, **kwargs)
+            job.status = "done"
+        except Exception as e:
+            print(f"Job '{job.label}' failed: {e}")
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = "failed"
+        finally:
+            job.trace = tracer.records()
+            trace_file = os.getenv("WFP_TRACE_FILE")
+            if trace_file:
+                tracer.export_jsonl(trace_file, job.trace)
+            job.finished_at = time.time()
+            _current.job = None
+
+
+_frame_cache = None
+_job_runner = None
+_singleton_lock = threading.Lock()
+
+
+def get_frame_cache():
+    """Returns the process-wide frame cache; WFP_FRAME_CACHE_ENTRIES overrides its size."""
+    global _frame_cache
+    with _singleton_lock:
+        if _frame_cache is None:
+            _frame_cache = FrameCache(int(os.getenv("WFP_FRAME_CACHE_ENTRIES", DEFAULT_FRAME_CACHE_ENTRIES)))
+        return _frame_cache
+
+
+def get_job_runner():
+    global _job_runner
+    with _singleton_lock:
+        if _job_runner is None:
+            _job_runner = JobRunner()
+        return _job_runner
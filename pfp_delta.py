@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+
+from instrumentation import info
+from pfp_schema import KEY_COLUMNS
+from pfp_sidecar import read_row_digest
+
+
+# Bump when column_hashes changes, so digests stored with older snapshots are recomputed instead of compared
+ROW_HASH_VERSION = 1
+# Derived from the key columns, so left out of the content hash
+DERIVED_COLUMNS = ('Unique Code',)
+# Every missing cell (NaN, None, NA, a missing category) hashes alike, whatever the column dtype
+MISSING_HASH = pd.util.hash_array(np.array(["\x00missing"], dtype=object))[0]
+
+
+def _unique_hashes(uniques):
+    """Hashes of distinct non-missing values: numbers (any type, in any column) as float64, anything else on its text."""
+    uniques = np.asarray(uniques, dtype=object)
+    numeric = np.array([isinstance(value, (int, float, np.number, np.bool_)) for value in uniques], dtype=bool)
+    hashes = np.empty(len(uniques), dtype=np.uint64)
+    if numeric.any():
+        hashes[numeric] = pd.util.hash_array(uniques[numeric].astype(np.float64))
+    if not numeric.all():
+        hashes[~numeric] = pd.util.hash_array(uniques[~numeric].astype(str).astype(object))
+    return hashes
+
+
+def column_hashes(values):
+    """
+    uint64 hash per cell of the Series values, stable across the dtype drift between loads of
+    the same data: an int column that becomes float because of one blank cell, a column read
+    as categorical in compact mode or as object when one cell holds text. Numeric columns are
+    hashed vectorized, other columns once per distinct value.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = column_hashes(pd.Series(values.cat.categories))
+        # Code -1 (missing) picks the trailing MISSING_HASH
+        return np.append(categories, MISSING_HASH)[values.cat.codes.to_numpy()]
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        numbers = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        hashes = pd.util.hash_array(numbers)
+        hashes[np.isnan(numbers)] = MISSING_HASH
+        return hashes
+    codes, uniques = pd.factorize(values)
+    return np.append(_unique_hashes(uniques), MISSING_HASH)[codes]
+
+
+def row_hashes(df, columns):
+    """Per-row uint64 content hashes over `columns`, combining their column_hashes."""
+    parts = pd.DataFrame({i: column_hashes(df[col]) for i, col in enumerate(columns)})
+    return pd.util.hash_pandas_object(parts, index=False).to_numpy()
+
+
+def row_keys(df, columns=KEY_COLUMNS):
+    """
+    int64 composite key over the key columns, like pfp_schema.pfp_key but on column_hashes,
+    so a 'Project Number' column read as float in one export still matches the snapshot.
+    """
+    return row_hashes(df, columns).view(np.int64)
+
+
+def content_columns(df):
+    """The columns a row's content hash covers: all but the key columns (matched by key) and derived ones."""
+    return [col for col in df.columns if col not in DERIVED_COLUMNS and col not in KEY_COLUMNS]
+
+
+class RowDigest:
+    """
+    int64 key (row_keys) and uint64 content hash per row of a cleaned PFP frame, with the
+    columns the hashes cover. Published with the snapshot in its Parquet sidecar, so an
+    incremental run compares the export against it without loading or rehashing the
+    previous snapshot. source identifies the snapshot it describes.
+    """
+
+    version = ROW_HASH_VERSION
+
+    def __init__(self, keys, hashes, columns, source=None):
+        self.keys = np.asarray(keys, dtype=np.int64)
+        self.hashes = np.asarray(hashes, dtype=np.uint64)
+        self.columns = list(columns)
+        self.source = source
+
+    @classmethod
+    def of(cls, df, source=None):
+        columns = content_columns(df)
+        return cls(row_keys(df), row_hashes(df, columns), columns, source)
+
+    @classmethod
+    def from_sidecar(cls, sidecar_content, source=None):
+        """The digest stored in a sidecar, or None when it has none or one hashed another way."""
+        stored = read_row_digest(sidecar_content)
+        if stored is None or stored[0].get("version") != ROW_HASH_VERSION:
+            return None
+        meta, keys, hashes = stored
+        return cls(keys, hashes, meta["columns"], source)
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def merge_pfp_delta(current_df, previous, clean):
+    """
+    Incremental cleaning against the RowDigest of the previous snapshot.
+
+    current_df is the export as read; it is de-duplicated on row_keys (first occurrence wins,
+    like 'Unique Code'). Rows whose key and content hash match the digest are kept as-is, and
+    only added/changed rows go through `clean`. Returns (merged_df, manifest, digest) where
+    merged_df equals clean() of the de-duplicated export without a 'Unique Code' column,
+    manifest counts added/removed/modified/unchanged rows relative to the snapshot and digest
+    is the RowDigest of merged_df. Returns (None, None, None) when the columns don't line up
+    and a full run is needed instead.
+    """
+    columns = content_columns(current_df)
+    if columns != previous.columns:
+        print("Snapshot columns differ from the current export; incremental run not possible.")
+        return None, None, None
+
+    # Hashed before de-duplicating, so the export is filtered only once, at the end
+    keys = row_keys(current_df)
+    hashes = row_hashes(current_df, columns)
+    first = ~pd.Index(keys).duplicated(keep='first')
+
+    first_in_previous = ~pd.Index(previous.keys).duplicated(keep='first')
+    previous_keys = pd.Index(previous.keys[first_in_previous])
+    previous_hashes = previous.hashes[first_in_previous]
+
+    positions = previous_keys.get_indexer(keys)
+    unchanged = first & (positions >= 0)
+    unchanged[unchanged] = previous_hashes[positions[unchanged]] == hashes[unchanged]
+    changed = first & ~unchanged
+    cleaned_changes = clean(current_df[changed])
+    kept_changes = changed & current_df.index.isin(cleaned_changes.index)
+    kept = unchanged | kept_changes
+    merged_df = current_df[kept]
+
+    matched = int((positions[kept] >= 0).sum())
+    modified = int((positions[kept_changes] >= 0).sum())
+    manifest = {
+        "previous_rows": int(len(previous_keys)),
+        "rows": int(len(merged_df)),
+        "unchanged": int(unchanged.sum()),
+        "added": int(kept_changes.sum()) - modified,
+        "modified": modified,
+        # Kept keys are unique, so each matches a different snapshot row
+        "removed": int(len(previous_keys)) - matched,
+    }
+    info(f"Incremental PFP run: {manifest}")
+    return merged_df, manifest, RowDigest(keys[kept], hashes[kept], columns)
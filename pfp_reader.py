@@ -0,0 +1,74 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+
+# The only PFP columns used by the cleaning and GBA stages
+PFP_COLUMNS = [
+    'Project Number',
+    'Project Name',
+    'Employee Name',
+    'Resource',
+    'Expenditure Organization Name',
+]
+# Columns the 'Unique Code' is built from; read as text so every chunk renders them alike
+KEY_COLUMNS = ['Project Number', 'Employee Name']
+DEFAULT_CHUNK_SIZE = 50_000
+
+
+def iter_excel_chunks(content, columns=PFP_COLUMNS, chunk_size=DEFAULT_CHUNK_SIZE, sheet_name=None, text_columns=KEY_COLUMNS):
+    """
+    Streams an .xlsx/.xlsm workbook row by row in openpyxl read-only mode, keeping only
+    `columns`, and yields DataFrames of at most chunk_size rows. Peak memory is bounded by
+    the chunk size instead of the full sheet. Raises KeyError if a column is missing.
+    The cells of text_columns are converted to text one by one, so a number comes out as
+    '123' whatever dtype the rest of its chunk would infer (a blank turns ints into floats).
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        positions = {str(name).strip(): i for i, name in enumerate(header) if name is not None}
+        missing = [col for col in columns if col not in positions]
+        if missing:
+            raise KeyError(f"Columns not found in sheet: {missing}")
+        indices = [positions[col] for col in columns]
+
+        buffer = []
+        for row in rows:
+            # Skip fully blank rows like pd.read_excel does
+            if not any(value is not None for value in row):
+                continue
+            buffer.append([row[i] if i < len(row) else None for i in indices])
+            if len(buffer) >= chunk_size:
+                yield _chunk_frame(buffer, columns, text_columns)
+                buffer = []
+        if buffer:
+            yield _chunk_frame(buffer, columns, text_columns)
+    finally:
+        workbook.close()
+
+
+def _chunk_frame(rows, columns, text_columns=()):
+    df = pd.DataFrame(rows, columns=columns)
+    for col in text_columns:
+        if col in columns:
+            i = columns.index(col)
+            df[col] = pd.Series([np.nan if row[i] is None else str(row[i]) for row in rows], dtype=object)
+    # Missing cells come back as None; use NaN so string conversions match pd.read_excel output
+    return df.fillna(np.nan)
+
+
+def iter_pfp_chunks(content, file_name, columns=PFP_COLUMNS, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Chunked, column-projected reader for a PFP export. Legacy .xls files cannot be
+    streamed by openpyxl, so they are read with usecols and yielded as a single chunk.
+    """
+    if file_name.endswith((".xlsx", ".xlsm")):
+        yield from iter_excel_chunks(content, columns, chunk_size)
+    else:
+        yield pd.read_excel(io.BytesIO(content), engine="xlrd", usecols=columns)[columns]
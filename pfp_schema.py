@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+
+# Highly repetitive PFP columns held as categoricals in compact mode
+CATEGORICAL_COLUMNS = [
+    'Project Number',
+    'Project Name',
+    'Employee Name',
+    'Resource',
+    'Expenditure Organization Name',
+]
+KEY_COLUMNS = ['Project Number', 'Employee Name']
+
+
+def to_compact(df, columns=CATEGORICAL_COLUMNS):
+    """Converts the repetitive columns present in df to categoricals (in place) and returns df."""
+    for col in columns:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    return df
+
+
+def _text_hashes(values):
+    """
+    uint64 hash per row of str(value), computed once per distinct value via the categories,
+    so 'nan' for missing cells and 30000001 vs '30000001' hash like 'Unique Code' compares them.
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    if isinstance(uniques, pd.Categorical):
+        uniques = np.asarray(uniques)
+    text = np.array([str(value) for value in uniques], dtype=object)
+    return pd.util.hash_array(text)[codes]
+
+
+def pfp_key(df, columns=KEY_COLUMNS):
+    """
+    int64 composite key equivalent to 'Unique Code' (Project Number - Employee Name) without
+    building the strings: equal codes give equal keys across frames, chunks and snapshots.
+    """
+    parts = pd.DataFrame({col: _text_hashes(df[col]) for col in columns})
+    return pd.Series(pd.util.hash_pandas_object(parts, index=False).values.view(np.int64), index=df.index, name="Key")
+
+
+def _as_text(values):
+    """values.astype(str); numeric columns, slow to format, are converted once per distinct value."""
+    if not pd.api.types.is_numeric_dtype(values.dtype):
+        return values.astype(str)
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    return pd.Series(pd.Index(uniques).astype(str).take(codes), index=values.index, name=values.name)
+
+
+def with_unique_code(df):
+    """Export form of a compact (or incrementally cleaned) frame: adds the human-readable 'Unique Code' as the first column."""
+    if 'Unique Code' in df.columns:
+        return df
+    unique_code = _as_text(df['Project Number']) + ' - ' + _as_text(df['Employee Name'])
+    return pd.concat([unique_code.rename('Unique Code'), df], axis=1)
+
+
+def parquet_safe(df):
+    """
+    df with its object columns that mix Python types (1001, 'N/A' and 1003.0 in one column, as
+    openpyxl returns them) converted to text, missing cells kept missing: Parquet needs one type
+    per column. Categoricals with such categories are converted the same way. df is not modified.
+    """
+    result = df
+    for col in df.columns:
+        values = df[col]
+        categorical = isinstance(values.dtype, pd.CategoricalDtype)
+        if categorical:
+            values = values.astype(object) if pd.api.types.infer_dtype(values.cat.categories) in ("mixed", "mixed-integer") else None
+        elif values.dtype != object or pd.api.types.infer_dtype(values, skipna=True) not in ("mixed", "mixed-integer"):
+            values = None
+        if values is not None:
+            text = values.where(values.isna(), values.astype(str))
+            if result is df:
+                result = df.copy(deep=False)
+            result[col] = text.astype("category") if categorical else text
+    return result
@@ -0,0 +1,118 @@
+import io
+import json
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from instrumentation import info
+from pfp_schema import parquet_safe
+
+
+SIDECAR_SUFFIX = ".parquet"
+# Parquet key-value metadata holding the ETag of the Excel file the sidecar was written for
+SOURCE_ETAG_KEY = b"wfp.source_etag"
+# Hidden columns holding the row digest (pfp_delta.RowDigest) of the snapshot, and the metadata
+# describing it; read_snapshot leaves them out
+DIGEST_KEY_COLUMN = "__row_key"
+DIGEST_HASH_COLUMN = "__row_hash"
+DIGEST_COLUMNS = (DIGEST_KEY_COLUMN, DIGEST_HASH_COLUMN)
+DIGEST_META_KEY = b"wfp.row_digest"
+
+
+def sidecar_name(file_name):
+    """'Project Plan Analysis-continuous-2024-01-31.xlsx' -> 'Project Plan Analysis-continuous-2024-01-31.parquet'"""
+    return os.path.splitext(file_name)[0] + SIDECAR_SUFFIX
+
+
+def dataframe_to_sidecar_bytes(df, source_etag=None, digest=None):
+    """
+    Serializes df to Parquet (dtypes preserved, index dropped like the Excel export), recording
+    source_etag, the ETag of the Excel file it mirrors, in the file metadata. digest, the
+    RowDigest of df, is stored alongside in DIGEST_COLUMNS. Columns mixing Python types are
+    stored as text (see pfp_schema.parquet_safe).
+    """
+    table = pa.Table.from_pandas(parquet_safe(df), preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    if source_etag:
+        metadata[SOURCE_ETAG_KEY] = str(source_etag).encode("utf-8")
+    if digest is not None:
+        table = table.append_column(DIGEST_KEY_COLUMN, pa.array(digest.keys)).append_column(DIGEST_HASH_COLUMN, pa.array(digest.hashes))
+        metadata[DIGEST_META_KEY] = json.dumps({"version": digest.version, "columns": digest.columns}).encode("utf-8")
+    table = table.replace_schema_metadata(metadata)
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer)
+    return buffer.getvalue()
+
+
+def upload_sidecar(session, folder_path, file_name, df, source_etag=None, digest=None):
+    """
+    Uploads the Parquet sidecar for the Excel file folder_path/file_name, whose ETag after its
+    upload is source_etag, with the RowDigest of df when given. Returns True on success; a
+    failure only costs the fast load path, so it is reported and swallowed.
+    """
+    try:
+        content = dataframe_to_sidecar_bytes(df, source_etag, digest)
+        session.upload(folder_path, sidecar_name(file_name), content)
+        info(f"Sidecar '{sidecar_name(file_name)}' uploaded to '{folder_path}' ({len(content)} bytes)")
+        return True
+    except Exception as e:
+        print(f"Error writing Parquet sidecar for '{file_name}': {e}")
+        return False
+
+
+def sidecar_matches(sidecar_content, file_info=None, sidecar_info=None):
+    """
+    Whether the sidecar still mirrors the Excel file described by file_info: the ETag recorded
+    in the sidecar must be the file's current ETag. Sidecars written before the ETag was recorded
+    are trusted only when they were uploaded after the Excel file. Without file_info nothing
+    can be checked and the sidecar is trusted.
+    """
+    if file_info is None:
+        return True
+    recorded = (pq.read_metadata(io.BytesIO(sidecar_content)).metadata or {}).get(SOURCE_ETAG_KEY)
+    if recorded is not None:
+        return recorded.decode("utf-8") == str(file_info.get("ETag"))
+    return sidecar_info is not None and str(sidecar_info.get("TimeLastModified") or "") >= str(file_info.get("TimeLastModified") or "")
+
+
+def read_snapshot(content, sidecar_content=None, file_info=None, sidecar_info=None):
+    """
+    Loads a PFP snapshot DataFrame, preferring the Parquet sidecar bytes and falling back
+    to parsing the Excel bytes when the sidecar is missing, unreadable or no longer matches
+    the Excel file described by file_info (see sidecar_matches).
+    content may be a zero-argument callable so the Excel file is only downloaded when needed.
+    Returns (df, source) where source is "parquet" or "excel".
+    """
+    if sidecar_content is not None:
+        start = time.perf_counter()
+        try:
+            if sidecar_matches(sidecar_content, file_info, sidecar_info):
+                names = pq.read_schema(io.BytesIO(sidecar_content)).names
+                df = pd.read_parquet(io.BytesIO(sidecar_content), columns=[name for name in names if name not in DIGEST_COLUMNS])
+                info(f"Loaded snapshot from Parquet sidecar in {time.perf_counter() - start:.3f}s ({len(df)} rows)")
+                return df, "parquet"
+            print(f"Parquet sidecar of '{file_info.get('Name')}' was written for another version of the file, falling back to Excel")
+        except Exception as e:
+            print(f"Error reading Parquet sidecar, falling back to Excel: {e}")
+    if callable(content):
+        content = content()
+    start = time.perf_counter()
+    df = pd.read_excel(io.BytesIO(content), engine="openpyxl")
+    info(f"Loaded snapshot from Excel in {time.perf_counter() - start:.3f}s ({len(df)} rows)")
+    return df, "excel"
+
+
+def read_row_digest(sidecar_content):
+    """
+    (metadata, keys, hashes) of the row digest stored in the sidecar, reading only its columns;
+    metadata holds the digest's version and hashed columns. None when the sidecar has no digest.
+    """
+    parquet = pq.ParquetFile(io.BytesIO(sidecar_content))
+    meta = (parquet.schema_arrow.metadata or {}).get(DIGEST_META_KEY)
+    if meta is None:
+        return None
+    table = parquet.read(columns=list(DIGEST_COLUMNS))
+    return json.loads(meta), table.column(DIGEST_KEY_COLUMN).to_numpy(), table.column(DIGEST_HASH_COLUMN).to_numpy()
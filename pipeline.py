@@ -0,0 +1,756 @@
+"""
+The PFP -> GBA workbooks pipeline as explicit stages, shared by the Streamlit app
+(mainV0b.py) and the CLI (cli.py):
+
+    fetch_pfp -> clean -> publish_snapshot -> load_checker -> merge -> classify -> publish_gba
+
+A PipelineRun hands each stage's DataFrame to the next in memory and memoizes stage
+outputs in the frame cache under a key built from the identities of the files they
+derive from, so a chained run downloads each source once and never parses its own
+outputs back. A run of only the GBA stages starts from the latest OLD PFP snapshot
+instead, and a snapshot published by this process is found in the frame cache.
+"""
+import io
+import pandas as pd
+import numpy as np
+import os
+from datetime import datetime
+import json
+import time
+from sharepoint_session import get_sharepoint_session
+from sharepoint_folders import crawl_folder_tree
+from download_cache import get_download_cache
+from pfp_sidecar import read_snapshot, sidecar_matches, sidecar_name, upload_sidecar
+from snapshot_manifest import load_manifest, record_snapshot, snapshot_date, snapshot_entry
+from pfp_reader import DEFAULT_CHUNK_SIZE, PFP_COLUMNS, iter_pfp_chunks
+from excel_writer import serialize_dataframe_to_spool
+from gba_classification import split_by_gba
+from pfp_delta import RowDigest, merge_pfp_delta
+from pfp_schema import pfp_key, to_compact, with_unique_code
+from workbook_loader import LazyWorkbook, sheet_header_row
+from resource_index import ResourceIndex, get_resource_index
+from gba_publisher import PUBLISHED_STATUSES, publish_workbooks
+from upload_fingerprints import UploadFingerprints, dataframe_fingerprint
+from history_store import append_history
+from instrumentation import debug, info, traced, tracer
+from jobs import get_frame_cache, report_progress, source_identity
+from config import GBA_FOLDER, OLD_PFP_FOLDER, PFP_FOLDER, SITE_URL, WORKBOOK_STRUCTURE_FOLDER
+
+STAGES = ("fetch_pfp", "clean", "publish_snapshot", "load_checker", "merge", "classify", "publish_gba")
+FIRST_RUN_STAGES = STAGES[:3]
+GBA_STAGES = STAGES[3:]
+STAGE_PROGRESS = {
+    "fetch_pfp": "Fetching the PFP export...",
+    "clean": "Cleaning the PFP data...",
+    "publish_snapshot": "Uploading the cleaned PFP snapshot...",
+    "load_checker": "Loading the Workbook Structure...",
+    "merge": "Merging the PFP with the Checker sheet...",
+    "classify": "Splitting by GBA...",
+    "publish_gba": "Publishing the GBA workbooks...",
+}
+# 'Oracle Date' is the run date, so it is left out of the upload fingerprint: unchanged GBAs are not republished
+GBA_IGNORE_COLUMNS = ('Oracle Date',)
+
+def list_folders_and_subfolders(session, folder_path):
+    """
+    List all folders and subfolders in the given SharePoint folder.
+    Returns a list of tuples: (folder_name, folder_server_relative_url)
+    Listings run concurrently level by level and are served from the shared folder-tree cache.
+    """
+    try:
+        return crawl_folder_tree(session, folder_path)
+    except Exception as e:
+        print(f"Error listing folders: {e}")
+        return []
+
+
+def fetch_file_from_sharepoint_folder(site_url, folder_path, client_id, client_secret, session=None, list_subfolders=True):
+    """
+     Parameters:
+        site_url (str): The URL of the SharePoint site.
+        folder_path (str): The path to the SharePoint folder.
+        file_name (str): The name of the file to fetch.
+        client_id (str): The Client ID for authentication.
+        client_secret (str): The Client Secret for authentication.
+        session: Shared SharePoint session; the pooled one for site_url is used if omitted.
+        list_subfolders (bool): Crawl and print the folder tree first; pass False to skip the crawl.
+    """
+    try:
+        session = session or get_sharepoint_session(site_url, client_id, client_secret)
+        if list_subfolders:
+            # List folders and subfolders
+            folders_info = list_folders_and_subfolders(session, folder_path)
+            debug("Folders and subfolders in the folder:")
+            for name, url in folders_info:
+                debug(f"Name: {name}, Link: {url}")
+        # Access the SharePoint folder
+        files = session.list_files(folder_path)
+        if not files:
+            print(f"No files found in folder: {folder_path}")
+            return None, pd.DataFrame()
+       
+        # pick first Excel file (.xlsx, .xlsm, .xls)
+        for f in files:
+            fname = f["Name"]
+            if fname.endswith((".xlsx", ".xlsm", ".xls")):
+                def parse(f=f, fname=fname):
+                    file_content = get_download_cache().fetch(session, f["ServerRelativeUrl"], file_info=f)
+                    # choose engine depending on extension
+                    with tracer.span("parse", file=fname, bytes=len(file_content)) as span:
+                        if fname.endswith((".xlsx", ".xlsm")):
+                            df = pd.read_excel(io.BytesIO(file_content), engine="openpyxl")
+                        else:  # .xls
+                            df = pd.read_excel(io.BytesIO(file_content), engine="xlrd")
+                        span.rows = len(df)
+                    return df
+
+                # Parsed once per version of the file; attrs["source"] keys what is derived from it
+                source = source_identity(f)
+                df = get_frame_cache().get_or_compute(("parse", source), parse)
+                df.attrs["source"] = source
+                return fname, df
+
+        print("No Excel files in folder")
+        return None, pd.DataFrame()
+
+    except Exception as e:
+        print(f"Error accessing SharePoint folder or files: {e}")
+        return None, pd.DataFrame()
+    
+def remove_invalid_employees(df):
+    """Row-wise cleaning rules shared by the full, streaming and incremental PFP runs."""
+    # Remove rows with missing values in 'Employee Name' column
+    df_no_missing = df.dropna(subset=['Employee Name'])
+    # Remove rows where 'Employee Name' is 'Labor Cost, Conversion Employee'
+    return df_no_missing[df_no_missing['Employee Name'] != 'Labor Cost, Conversion Employee']
+
+@traced("clean")
+def first_time_run_pfp(df, compact=False):
+    debug("First 5 rows:", lambda: df.head(5))
+    debug("\nColumn names:", lambda: df.columns)
+    if compact:
+        # Categorical columns, de-duplicated on the int64 key; 'Unique Code' is added at export (with_unique_code)
+        df = to_compact(df)
+        return remove_invalid_employees(df[~pfp_key(df).duplicated(keep='first')])
+    df['Unique Code'] = df['Project Number'].astype(str) + ' - ' + df['Employee Name'].astype(str)
+    cols = ['Unique Code'] + [col for col in df.columns if col != 'Unique Code']
+    df = df[cols]
+    debug("\nNew column 'Unique Code':", lambda: df[['Unique Code']].head(5))
+    debug(lambda: df.head(5))
+    ## Save and upload the updated DataFrame to SharePoint
+    #Unique_code_date_str = datetime.now().strftime('%Y-%m-%d')
+    #output_file_name = f"Project Plan Analysis-continuous-Unique code-{Unique_code_date_str}.xlsx"
+    #upload_dataframe_to_sharepoint_folder(site_url, folder_path, output_file_name, df, client_id, client_secret)
+	
+    # Remove duplicate rows based on 'Unique Code', keeping only the first occurrence
+    df_unique = df.drop_duplicates(subset=['Unique Code'], keep='first')
+	
+    ## Save and upload the deduplicated DataFrame to OLD PFP folder in SharePoint
+    #date_str = datetime.now().strftime('%Y-%m-%d')
+    #dedup_output_file_name = f"Project Plan Analysis-continuous-unique values-{date_str}.xlsx"
+    #upload_dataframe_to_sharepoint_folder(site_url, old_pfp_folder, dedup_output_file_name, df_unique, client_id, client_secret)
+	
+    df_final = remove_invalid_employees(df_unique)
+    return df_final
+
+    ## Save and upload the final cleaned DataFrame to OLD PFP folder in SharePoint
+    #final_date_str = datetime.now().strftime('%Y-%m-%d')
+    #final_output_file_name = f"Project Plan Analysis-continuous-final-{final_date_str}.xlsx"
+    #upload_dataframe_to_sharepoint_folder(site_url, old_pfp_folder, final_output_file_name, df_final, client_id, client_secret)
+    #print("\nAll files processed and uploaded to SharePoint.")
+
+@traced("clean_streaming")
+def first_time_run_pfp_streaming(chunks, compact=False):
+    """
+    Chunked variant of first_time_run_pfp for the streaming reader. Each chunk gets its
+    'Unique Code', duplicates are dropped across all chunks (first occurrence wins) and
+    missing/placeholder employees are removed as the chunk arrives, so only cleaned rows
+    are kept in memory. With compact the int64 key replaces 'Unique Code' and the result
+    uses categorical columns.
+    """
+    seen_codes = set()
+    seen_keys = np.empty(0, dtype=np.int64)
+    cleaned_chunks = []
+    total_rows = 0
+    for chunk in chunks:
+        total_rows += len(chunk)
+        if compact:
+            keys = pfp_key(chunk)
+            keep = ~keys.duplicated(keep='first') & ~keys.isin(seen_keys)
+            seen_keys = np.concatenate([seen_keys, keys[keep].values])
+            cleaned_chunks.append(remove_invalid_employees(chunk[keep]))
+            continue
+        chunk.insert(0, 'Unique Code', chunk['Project Number'].astype(str) + ' - ' + chunk['Employee Name'].astype(str))
+        chunk = chunk.drop_duplicates(subset=['Unique Code'], keep='first')
+        chunk = chunk[~chunk['Unique Code'].isin(seen_codes)]
+        seen_codes.update(chunk['Unique Code'])
+        cleaned_chunks.append(remove_invalid_employees(chunk))
+    df_final = pd.concat(cleaned_chunks, ignore_index=True) if cleaned_chunks else pd.DataFrame()
+    if compact:
+        df_final = to_compact(df_final)
+    info(f"Streamed {total_rows} rows, {len(df_final)} after cleaning")
+    return df_final
+
+@traced("clean_incremental", rows_of=lambda result: len(result[0]))
+def first_time_run_pfp_delta(df, previous, compact=False):
+    """
+    Incremental variant of first_time_run_pfp: de-duplicates the export on the int64 key and
+    diffs it against previous, the RowDigest of the latest OLD PFP snapshot, by key and per-row
+    content hash, cleaning only added/changed rows. 'Unique Code' is built for the result only
+    (compact mode leaves it to the export). Returns (df_final, manifest, digest) with the
+    RowDigest of df_final; manifest and digest are None when the snapshot can't be used and a
+    full run was done instead.
+    """
+    if compact:
+        df = to_compact(df)
+    df_final, manifest, digest = merge_pfp_delta(df, previous, remove_invalid_employees)
+    if df_final is None:
+        return first_time_run_pfp(df, compact=compact), None, None
+    return (df_final if compact else with_unique_code(df_final)), manifest, digest
+
+def fetch_workbook_from_sharepoint_folder(site_url, folder_path, client_id, client_secret, extensions=(".xlsx", ".xlsm", ".xls"), session=None):
+    """
+    Downloads the first Excel file in the folder once, without parsing it.
+    Returns (file_name, LazyWorkbook) whose sheets are parsed on first access,
+    or (None, None) if no file with one of the given extensions is found.
+    """
+    try:
+        session = session or get_sharepoint_session(site_url, client_id, client_secret)
+        for f in session.list_files(folder_path):
+            fname = f["Name"]
+            if fname.endswith(extensions):
+                # The LazyWorkbook keeps its parsed sheets, so a cached one also skips re-parsing
+                source = source_identity(f)
+                return fname, get_frame_cache().get_or_compute(
+                    ("workbook", source),
+                    lambda: LazyWorkbook(get_download_cache().fetch(session, f["ServerRelativeUrl"], file_info=f), fname, source))
+        print("No Excel files in folder")
+        return None, None
+    except Exception as e:
+        print(f"Error accessing SharePoint folder or files: {e}")
+        return None, None
+
+def fetch_pfp_chunks_from_sharepoint_folder(site_url, folder_path, client_id, client_secret, columns=PFP_COLUMNS, chunk_size=DEFAULT_CHUNK_SIZE, session=None):
+    """
+    Streaming counterpart of fetch_file_from_sharepoint_folder for large PFP exports.
+    Returns (file_name, chunks) where chunks yields DataFrames holding only `columns`,
+    or (None, None) if no Excel file is found.
+    """
+    try:
+        session = session or get_sharepoint_session(site_url, client_id, client_secret)
+        for f in session.list_files(folder_path):
+            fname = f["Name"]
+            if fname.endswith((".xlsx", ".xlsm", ".xls")):
+                file_content = get_download_cache().fetch(session, f["ServerRelativeUrl"], file_info=f)
+                return fname, iter_pfp_chunks(file_content, fname, columns, chunk_size)
+        print("No Excel files in folder")
+        return None, None
+    except Exception as e:
+        print(f"Error accessing SharePoint folder or files: {e}")
+        return None, None
+
+def upload_dataframe_to_sharepoint_folder(site_url, folder_path, file_name, df, client_id, client_secret, session=None, constant_memory=True, skip_unchanged=True):
+	"""
+	Serializes df to .xlsx and uploads it to folder_path/file_name. With constant_memory the
+	XlsxWriter constant-memory writer streams into a spooled temp file that is uploaded in
+	chunks; otherwise the openpyxl writer and a single in-memory upload are used.
+	With skip_unchanged nothing is serialized or sent when the folder's upload fingerprints
+	show the server copy already holds this frame.
+	Returns "uploaded" or "unchanged" (see gba_publisher.PUBLISHED_STATUSES), or False when the upload failed.
+	"""
+	try:
+		session = session or get_sharepoint_session(site_url, client_id, client_secret)
+		if skip_unchanged:
+			# Only this file is looked up: the OLD PFP folder grows with every snapshot
+			known = UploadFingerprints.load(session, folder_path, [file_name])
+			fingerprint = dataframe_fingerprint(df)
+			if known.unchanged(file_name, fingerprint):
+				info(f"File '{file_name}' in '{folder_path}' already holds this data, upload skipped")
+				return "unchanged"
+		if constant_memory:
+			excel_file, size = serialize_dataframe_to_spool(df, file_name)
+			with excel_file:
+				start = time.perf_counter()
+				session.upload_stream(folder_path, file_name, excel_file, size)
+				elapsed = time.perf_counter() - start
+			info(f"Uploaded {size} bytes in {elapsed:.2f}s ({size / max(elapsed, 1e-9) / 1e6:.1f} MB/s)")
+		else:
+			excel_buffer = io.BytesIO()
+			with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
+				df.to_excel(writer, index=False)
+			session.upload(folder_path, file_name, excel_buffer.getvalue())
+		info(f"File '{file_name}' uploaded successfully to '{folder_path}'")
+		if skip_unchanged:
+			known.save({file_name: fingerprint})
+		return "uploaded"
+	except Exception as e:
+		print(f"Error uploading DataFrame: {e}")
+		return False
+
+@traced("load_checker", rows_of=lambda result: len(result[1]))
+def fetch_and_clean_checker_from_sharepoint(sheet):
+    """
+    Takes the macro Excel file fetched with fetch_workbook_from_sharepoint_folder (a LazyWorkbook,
+    or a pd.ExcelFile which is parsed eagerly), cleans the 'Checker' sheet by dropping rows with blank
+    'Person Number (from Department Tab)', and returns (sheets, cleaned DataFrame).
+    With a LazyWorkbook only the 'Checker' sheet is parsed; other sheets parse on first access.
+    """
+    
+    if isinstance(sheet, LazyWorkbook):
+        sheets = sheet
+    else:
+        sheets = {name: pd.read_excel(sheet, sheet_name=name, header=sheet_header_row(name)) for name in sheet.sheet_names}
+    info(f"\nSheets: {list(sheets)}")
+    # Clean 'Checker' sheet
+    if "Checker" in sheets:
+        df_checker = sheets["Checker"]
+        df_checker_no_blank = df_checker.dropna(subset=["Person Number\n(from Department Tab)"])
+        debug("\nOriginal 'Checker' sheet (may contain blanks):", lambda: df_checker.head(15))
+        debug("\n'Checker' sheet with no blank 'Person Number':", lambda: df_checker_no_blank.head(15))
+        return sheets, df_checker_no_blank
+    else:
+        print("'Checker' sheet not found in macro file.")
+        return sheets, None
+
+@traced("load_snapshot")
+def fetch_latest_pfp_for_employee_remapping_to_create_gba_from_old_pfp(site_url, folder_path, client_id, client_secret, session=None, as_of=None):
+        """
+        Fetches the latest 'Project Plan Analysis-continuous-YYYY-MM-DD.xlsx' file from the specified SharePoint folder,
+        or with as_of ('YYYY-MM-DD') the latest one dated on or before that day.
+        The snapshot manifest in the folder is read first; the folder is only listed when the manifest is missing or stale.
+        Returns the DataFrame of the latest file, or None if not found.
+        """
+        session = session or get_sharepoint_session(site_url, client_id, client_secret)
+        snapshot = find_snapshot(session, folder_path, as_of)
+        return load_snapshot_file(session, *snapshot) if snapshot is not None else None
+
+@traced("load_snapshot_digest")
+def fetch_latest_pfp_digest(site_url, folder_path, client_id, client_secret, session=None):
+        """
+        RowDigest of the latest snapshot in the folder for an incremental run: read from its sidecar
+        when the sidecar holds one for the current version of the file, else computed from the
+        loaded snapshot. Returns None if there is no snapshot.
+        """
+        session = session or get_sharepoint_session(site_url, client_id, client_secret)
+        snapshot = find_snapshot(session, folder_path)
+        if snapshot is None:
+            return None
+        latest_file, sidecar = snapshot
+        source = snapshot_cache_key(latest_file, sidecar)[1]
+        if sidecar:
+            try:
+                sidecar_content = get_download_cache().fetch(session, sidecar["ServerRelativeUrl"], file_info=sidecar)
+                digest = RowDigest.from_sidecar(sidecar_content, source) if sidecar_matches(sidecar_content, latest_file, sidecar) else None
+                if digest is not None:
+                    info(f"Row digest of '{latest_file['Name']}' read from its sidecar ({len(digest)} rows)")
+                    return digest
+            except Exception as e:
+                print(f"Error reading the row digest of '{latest_file['Name']}', hashing the snapshot instead: {e}")
+        df = load_snapshot_file(session, latest_file, sidecar)
+        return RowDigest.of(df, df.attrs.get("source"))
+
+def find_snapshot(session, folder_path, as_of=None):
+    """
+    (file info, sidecar file info or None) of the latest snapshot in the folder, or of the
+    latest one dated on or before as_of ('YYYY-MM-DD'). Returns None if there is no such snapshot.
+    The snapshot manifest is read first and its entry revalidated with one properties request;
+    the folder is only listed when the manifest is missing or marked invalid, or the workbook
+    was replaced or removed since the entry was recorded.
+    """
+    manifest = load_manifest(session, folder_path)
+    if manifest is not None:
+        entry = snapshot_entry(manifest, as_of)
+        if entry is None:
+            print("No snapshot in the manifest" + (f" on or before {as_of}." if as_of else "."))
+            return None
+        try:
+            file_info = session.get_file_properties(entry["file"]["ServerRelativeUrl"])
+        except Exception as e:
+            file_info = None
+            print(f"Error reading the properties of '{entry['name']}': {e}")
+        if file_info is not None and file_info.get("ETag") == entry["file"].get("ETag"):
+            return file_info, entry["sidecar"]
+        print(f"Snapshot manifest entry for {entry['date']} is stale; listing the folder instead. Rebuild it with 'python cli.py rebuild-manifest'.")
+
+    files = session.list_files(folder_path)
+    excel_files = []
+    file_dates = []
+
+    for f in files:
+        fname = f["Name"]
+        date = snapshot_date(fname)
+        if date and (as_of is None or date <= str(as_of)[:10]):
+            excel_files.append(f)
+            file_dates.append(datetime.strptime(date, "%Y-%m-%d"))
+
+    if not excel_files:
+        print("No matching Excel files found in folder.")
+        return None
+    latest_file = excel_files[file_dates.index(max(file_dates))]
+    sidecar = next((f for f in files if f["Name"] == sidecar_name(latest_file["Name"])), None)
+    return latest_file, sidecar
+
+def load_snapshot_file(session, latest_file, sidecar=None):
+    """Loads the snapshot described by its file info dict, preferring the Parquet sidecar file info when given."""
+    latest_fname = latest_file["Name"]
+    info(f"Latest file: {latest_fname}")
+    # Prefer the Parquet sidecar written next to the snapshot; parse the Excel file only without one
+    cache = get_download_cache()
+
+    def load():
+        sidecar_content = cache.fetch(session, sidecar["ServerRelativeUrl"], file_info=sidecar) if sidecar else None
+        return read_snapshot(lambda: cache.fetch(session, latest_file["ServerRelativeUrl"], file_info=latest_file), sidecar_content, latest_file, sidecar)[0]
+
+    key = snapshot_cache_key(latest_file, sidecar)
+    df = get_frame_cache().get_or_compute(key, load)
+    df.attrs["source"] = key[1]
+    debug(f"First 5 rows of '{latest_fname}':", lambda: df.head(5))
+    debug("-" * 40)
+    return df
+
+def merge_pfp_with_checker(pfp_df, gba_df):
+    """
+    Enriches the PFP rows with their Checker details, keeping the columns of the GBA workbooks.
+    gba_df is either the cleaned Checker frame (merged on 'Resource' vs 'Name') or a ResourceIndex,
+    whose lookup gives exactly one output row per PFP row even when Checker repeats a name.
+    """
+    if isinstance(gba_df, ResourceIndex):
+        with tracer.span("lookup") as span:
+            merged_df = gba_df.enrich(pfp_df, 'Resource')
+            span.rows = len(merged_df)
+    else:
+        # Merge based on resource name/person
+        with tracer.span("merge") as span:
+            merged_df = pd.merge(
+                pfp_df,
+                gba_df[['Person Number\n(from Department Tab)', 'File Name','Department Name', 'Department Manager','Name']],
+                left_on='Resource',
+                right_on='Name',
+                how='left'
+            )
+            span.rows = len(merged_df)
+    # Select only the required columns
+    merged_df = merged_df[
+        [
+            'Unique Code',
+            'Project Number',
+            'Project Name',
+            'Resource',
+            'Expenditure Organization Name',
+            'Person Number\n(from Department Tab)',
+            'File Name',
+            'Department Manager'
+        ]
+    ]
+    return merged_df
+
+def process_pfp_and_workbook_structure_checker_tab_and_merge_for_first_run(pfp_df, gba_df):
+    """merge_pfp_with_checker followed by the split into one DataFrame per GBA. Returns (merged_df, {GBA key: DataFrame})."""
+    merged_df = merge_pfp_with_checker(pfp_df, gba_df)
+    # Split into one DataFrame per GBA based on the suffix of 'Expenditure Organization Name'
+    filtered_dfs = split_by_gba(merged_df)
+    return merged_df, filtered_dfs
+
+def resource_index_messages(resource_index):
+    duplicates = resource_index.duplicates
+    if duplicates.empty:
+        return []
+    conflicting = duplicates[duplicates["conflicting"]]
+    print(f"Checker repeats {len(duplicates)} names ({len(conflicting)} with differing details); the first row of each is used")
+    text = f"Checker repeats {len(duplicates)} names; the first row of each is used"
+    if len(conflicting):
+        text += f". {len(conflicting)} have differing details, e.g. " + "; ".join(conflicting["Name"].astype(str).head(5))
+    return [("warning", text)]
+
+
+def gba_publish_messages(results):
+    messages = []
+    uploaded = [name for name, result in results.items() if result["status"] == "uploaded"]
+    unchanged = [name for name, result in results.items() if result["status"] == "unchanged"]
+    failed = [name for name, result in results.items() if result["status"] == "failed"]
+    if uploaded:
+        messages.append(("success", f"{len(uploaded)} GBA-wise DataFrames uploaded to SharePoint GBA Workbooks folder."))
+    if unchanged:
+        messages.append(("info", f"{len(unchanged)} GBA workbooks unchanged since their last upload, not republished: " + ", ".join(unchanged)))
+    if failed:
+        messages.append(("error", "Failed to upload GBA-wise DataFrames: " + ", ".join(f"{name} ({results[name]['error']})" for name in failed)))
+    return messages
+
+
+def snapshot_cache_key(file_info, sidecar_info=None):
+    """Frame cache key of the snapshot stored as file_info (with its Parquet sidecar, if any)."""
+    return ("snapshot", (source_identity(file_info), source_identity(sidecar_info) if sidecar_info else None))
+
+
+class PipelineRun:
+    """
+    One run of some or all STAGES with its settings and SharePoint session.
+
+    Each stage takes what earlier stages of the run left in outputs and stores its own
+    result there under its name, with the key it was memoized under in keys. A key is the
+    stage name plus the keys of its inputs, down to the identities (URL, ETag...) of the
+    downloaded files, so an unchanged input never recomputes a stage. A None key (an input
+    of unknown identity) disables memoization for the stages that depend on it.
+    Stages report to messages as (level, text) and return False to stop the run.
+    """
+
+    def __init__(self, site_url=SITE_URL, pfp_folder=PFP_FOLDER, old_pfp_folder=OLD_PFP_FOLDER,
+                 workbook_structure_folder=WORKBOOK_STRUCTURE_FOLDER, gba_folder=GBA_FOLDER,
+                 low_memory=False, incremental=False, compact=False, as_of=None, session=None):
+        self.site_url = site_url
+        self.pfp_folder = pfp_folder
+        self.old_pfp_folder = old_pfp_folder
+        self.workbook_structure_folder = workbook_structure_folder
+        self.gba_folder = gba_folder
+        self.low_memory = low_memory
+        self.incremental = incremental
+        self.compact = compact
+        self.as_of = as_of
+        self.client_id = os.getenv('CLIENT_ID')
+        self.client_secret = os.getenv('CLIENT_SECRET')
+        self.session = session or get_sharepoint_session(site_url, self.client_id, self.client_secret)
+        self.date = datetime.now().strftime('%Y-%m-%d')
+        self.outputs = {}
+        self.keys = {}
+        self.messages = []
+        self.publish_state = None
+
+    def run(self, stages):
+        """
+        Runs the given stages in pipeline order, stopping at the first one that fails.
+        Returns (ok, messages) with the messages added by this call.
+        """
+        first = len(self.messages)
+        for name in STAGES:
+            if name not in stages:
+                continue
+            report_progress(STAGE_PROGRESS[name])
+            with tracer.span(f"stage:{name}"):
+                ok = getattr(self, name)()
+            if not ok:
+                return False, self.messages[first:]
+        return True, self.messages[first:]
+
+    def _memoized(self, stage, inputs, compute):
+        key = (stage,) + tuple(inputs) if all(item is not None for item in inputs) else None
+        self.keys[stage] = key
+        return get_frame_cache().get_or_compute(key, compute)
+
+    def _fail(self, text):
+        self.messages.append(("error", text))
+        return False
+
+    def fetch_pfp(self):
+        if self.low_memory:
+            file_name, chunks = fetch_pfp_chunks_from_sharepoint_folder(self.site_url, self.pfp_folder, self.client_id, self.client_secret, session=self.session)
+            if not file_name:
+                return self._fail("No file fetched or DataFrame is empty.")
+            # Consumed chunk by chunk by the clean stage, so nothing is kept or memoized
+            self.outputs["fetch_pfp"], self.keys["fetch_pfp"] = chunks, None
+            return True
+        file_name, df = fetch_file_from_sharepoint_folder(self.site_url, self.pfp_folder, self.client_id, self.client_secret, session=self.session, list_subfolders=False)
+        if not file_name or df.empty:
+            return self._fail("No file fetched or DataFrame is empty.")
+        source = df.attrs.get("source")
+        self.outputs["fetch_pfp"], self.keys["fetch_pfp"] = df, ("parse", source) if source else None
+        return True
+
+    def clean(self):
+        df, source = self.outputs["fetch_pfp"], self.keys["fetch_pfp"]
+        if self.low_memory and self.incremental:
+            return self._fail("Low-memory and incremental modes cannot be combined.")
+        if self.low_memory:
+            cleaned_df = first_time_run_pfp_streaming(df, compact=self.compact)
+            self.keys["clean"] = None
+            if cleaned_df.empty:
+                return self._fail("No file fetched or DataFrame is empty.")
+        else:
+            previous = self.load_snapshot_digest() if self.incremental else None
+            if previous is not None:
+                cleaned_df, changes, digest = self._memoized("clean", ("delta", source, previous.source, self.compact),
+                                                             lambda: first_time_run_pfp_delta(df, previous, compact=self.compact))
+                self.outputs["changes"], self.outputs["digest"] = changes, digest
+            else:
+                cleaned_df = self._memoized("clean", (source, self.compact), lambda: first_time_run_pfp(df, compact=self.compact))
+        if self.compact:
+            cleaned_df = with_unique_code(cleaned_df)
+        self.outputs["clean"] = cleaned_df
+        return True
+
+    def publish_snapshot(self):
+        cleaned_df = self.outputs["clean"]
+        if self.low_memory:
+            # Only the PFP_COLUMNS were read: published under a name the snapshot lookups ignore
+            # so a later run never takes it for a full snapshot
+            return self._publish_projected(cleaned_df, f"Project Plan Analysis-columns-{self.date}.xlsx")
+        output_file_name = f"Project Plan Analysis-continuous-{self.date}.xlsx"
+        status = upload_dataframe_to_sharepoint_folder(self.site_url, self.old_pfp_folder, output_file_name, cleaned_df, self.client_id, self.client_secret, session=self.session)
+        if not status:
+            return self._fail("Error uploading cleaned data to SharePoint.")
+        # Only full snapshots the server holds go into the history (low-memory runs returned above)
+        append_history("pfp", self.date, cleaned_df)
+        if status == "unchanged":
+            # Same data as today's snapshot on the server: its sidecar, manifest entry and changes are already there
+            self.messages.append(("info", f"Cleaned PFP data unchanged since '{output_file_name}' was uploaded to {self.old_pfp_folder}; upload skipped"))
+            return True
+        # The sidecar records the ETag of this upload so a later replacement of the workbook is detected on load
+        try:
+            file_info = self.session.get_file_properties(f"{self.old_pfp_folder}/{output_file_name}")
+        except Exception as e:
+            print(f"Error reading the properties of '{output_file_name}': {e}")
+            file_info = None
+        # The row digest travels with the sidecar so the next incremental run needs neither this frame nor its hashes
+        digest = self.outputs.get("digest")
+        if file_info is not None and digest is None:
+            digest = RowDigest.of(cleaned_df)
+        has_sidecar = file_info is not None and upload_sidecar(self.session, self.old_pfp_folder, output_file_name, cleaned_df, file_info["ETag"], digest)
+        entry = record_snapshot(self.session, self.old_pfp_folder, output_file_name, cleaned_df, has_sidecar, file_info)
+        if entry is not None:
+            # A GBA run started later in this process loads this snapshot from the frame cache
+            get_frame_cache().get_or_compute(snapshot_cache_key(entry["file"], entry["sidecar"]), lambda: cleaned_df)
+        else:
+            self.messages.append(("warning", f"The snapshot manifest in {self.old_pfp_folder} was not updated; rebuild it with 'python cli.py rebuild-manifest'."))
+        changes = self.outputs.get("changes")
+        if changes is not None:
+            # Change manifest published next to the snapshot it describes
+            manifest_name = f"Project Plan Analysis-continuous-{self.date}-changes.json"
+            try:
+                self.session.upload(self.old_pfp_folder, manifest_name, json.dumps(changes, indent=2).encode("utf-8"))
+            except Exception as e:
+                # The snapshot is already published; only the record of what changed is missing
+                print(f"Error uploading the change manifest '{manifest_name}': {e}")
+                self.messages.append(("warning", f"The change manifest '{manifest_name}' could not be uploaded: {e}"))
+            self.messages.append(("info", f"Changes since last snapshot: {changes['added']} added, {changes['removed']} removed, {changes['modified']} modified"))
+        self.messages.append(("success", f"Cleaned PFP data uploaded to SharePoint folder: {self.old_pfp_folder}"))
+        return True
+
+    def _publish_projected(self, cleaned_df, output_file_name):
+        status = upload_dataframe_to_sharepoint_folder(self.site_url, self.old_pfp_folder, output_file_name, cleaned_df, self.client_id, self.client_secret, session=self.session)
+        if not status:
+            return self._fail("Error uploading cleaned data to SharePoint.")
+        self.messages.append(("success", f"Cleaned PFP data (low-memory mode: {', '.join(PFP_COLUMNS)} only) uploaded to SharePoint folder {self.old_pfp_folder} as '{output_file_name}'. "
+                                         "It is not used as a snapshot; the latest full snapshot stays in use."))
+        return True
+
+    def load_checker(self):
+        file_name, workbook = fetch_workbook_from_sharepoint_folder(self.site_url, self.workbook_structure_folder, self.client_id, self.client_secret, session=self.session)
+        if not (file_name and file_name.endswith(".xlsm")):
+            return self._fail("No macro workbook (.xlsm) found for GBA extraction.")
+
+        def build_index():
+            sheets, df_checker_cleaned = fetch_and_clean_checker_from_sharepoint(workbook)
+            return ResourceIndex.from_checker(df_checker_cleaned, workbook.source) if df_checker_cleaned is not None else None
+
+        # Built from the Checker sheet once per workbook version and reused from disk afterwards
+        resource_index = self._memoized("load_checker", (workbook.source,), lambda: get_resource_index(workbook.source, build_index))
+        if resource_index is None:
+            return self._fail("Checker sheet not found or no valid rows.")
+        self.outputs["load_checker"] = resource_index
+        self.messages.extend(resource_index_messages(resource_index))
+        return True
+
+    def load_snapshot(self, as_of=None):
+        """The latest OLD PFP snapshot (or the latest on or before as_of), None when there is none."""
+        return fetch_latest_pfp_for_employee_remapping_to_create_gba_from_old_pfp(
+            self.site_url, self.old_pfp_folder, self.client_id, self.client_secret, session=self.session, as_of=as_of)
+
+    def load_snapshot_digest(self):
+        """RowDigest of the latest OLD PFP snapshot, None when there is none."""
+        return fetch_latest_pfp_digest(self.site_url, self.old_pfp_folder, self.client_id, self.client_secret, session=self.session)
+
+    def cleaned_pfp(self):
+        """
+        (frame, key) of the cleaned PFP the GBA stages start from: the clean stage's frame when
+        this run produced one and no as_of was asked for, else the snapshot loaded from OLD PFP.
+        """
+        if "clean" in self.outputs and self.as_of is None:
+            return self.outputs["clean"], self.keys["clean"]
+        df = self.load_snapshot(self.as_of)
+        if df is None:
+            return None, None
+        source = df.attrs.get("source")
+        return df, ("snapshot", source) if source else None
+
+    def merge(self):
+        pfp_df, pfp_input = self.cleaned_pfp()
+        if pfp_df is None:
+            return self._fail("No latest PFP file found for GBA extraction.")
+        resource_index = self.outputs["load_checker"]
+        unmatched = resource_index.unmatched(pfp_df['Resource'])
+        if unmatched:
+            print(f"{len(unmatched)} PFP resources not found in Checker: {unmatched[:20]}")
+            self.messages.append(("warning", f"{len(unmatched)} PFP resources are not in the Checker sheet, e.g. " + "; ".join(unmatched[:5])))
+        self.outputs["merge"] = self._memoized("merge", (pfp_input, self.keys["load_checker"]), lambda: merge_pfp_with_checker(pfp_df, resource_index))
+        return True
+
+    def classify(self):
+        merged_df = self.outputs["merge"]
+        # Split into one DataFrame per GBA based on the suffix of 'Expenditure Organization Name'
+        self.outputs["classify"] = self._memoized("classify", (self.keys["merge"],), lambda: split_by_gba(merged_df))
+        return True
+
+    def publish_gba(self):
+        # Add 'Oracle Date' and 'Index' columns to each GBA frame (copies handed out by the frame cache)
+        gba_frames = {}
+        gba_keys = {}
+        for key, df in self.outputs["classify"].items():
+            df.insert(0, 'Oracle Date', self.date)
+            df.insert(1, 'Index', range(1, len(df) + 1))
+            gba_frames[f"CPW_Tool_{key}_Main.xlsx"] = df
+            gba_keys[f"CPW_Tool_{key}_Main.xlsx"] = key
+
+        # Save each GBA DataFrame to SharePoint GBA Workbooks folder
+        results = publish_workbooks(self.session, self.gba_folder, gba_frames, ignore_columns=GBA_IGNORE_COLUMNS)
+        info(f"SharePoint session stats: {self.session.stats}")
+        info(f"Download cache stats: {get_download_cache().stats}")
+        info(f"Frame cache stats: {get_frame_cache().stats}")
+        failed = [name for name, result in results.items() if result["status"] == "failed"]
+        # Like the PFP history, only the workbooks the server holds (without the columns added above)
+        published = {gba_keys[name]: gba_frames[name].drop(columns=['Oracle Date', 'Index']) for name, result in results.items()
+                     if result["status"] in PUBLISHED_STATUSES}
+        if published:
+            append_history("gba", self.date, published, partition="GBA")
+        # Keep the frames so the failed workbooks can be republished without redoing the rest
+        self.publish_state = (self.site_url, self.gba_folder, gba_frames, results) if failed else None
+        self.messages.extend(gba_publish_messages(results))
+        return not failed
+
+
+def run_stages_job(stages, **settings):
+    """
+    Runs stages on a new PipelineRun with settings (see PipelineRun), on the job worker or from the CLI.
+    Returns {"messages": [(level, text)]}, plus "gba_publish" when the stages publish the GBA
+    workbooks: the state retry_gba_upload_job needs when some uploads failed, else None.
+    """
+    run = PipelineRun(**settings)
+    run.run(stages)
+    result = {"messages": run.messages}
+    if "publish_gba" in stages:
+        result["gba_publish"] = run.publish_state
+    return result
+
+def first_time_run_job(low_memory=False, incremental=False, compact=False, site_url=SITE_URL, folder_path=PFP_FOLDER, old_pfp_folder=OLD_PFP_FOLDER):
+    """Fetch -> clean -> publish of the PFP export (FIRST_RUN_STAGES)."""
+    return run_stages_job(FIRST_RUN_STAGES, site_url=site_url, pfp_folder=folder_path, old_pfp_folder=old_pfp_folder,
+                          low_memory=low_memory, incremental=incremental, compact=compact)
+
+def gba_extraction_job(site_url=SITE_URL, folder_path=WORKBOOK_STRUCTURE_FOLDER, old_pfp_folder=OLD_PFP_FOLDER, gba_folder=GBA_FOLDER, as_of=None):
+    """Checker + latest snapshot (or the latest on or before as_of) -> GBA workbooks (GBA_STAGES)."""
+    return run_stages_job(GBA_STAGES, site_url=site_url, workbook_structure_folder=folder_path, old_pfp_folder=old_pfp_folder,
+                          gba_folder=gba_folder, as_of=as_of)
+
+def full_run_job(low_memory=False, incremental=False, compact=False, site_url=SITE_URL, pfp_folder=PFP_FOLDER,
+                 workbook_structure_folder=WORKBOOK_STRUCTURE_FOLDER, old_pfp_folder=OLD_PFP_FOLDER, gba_folder=GBA_FOLDER, as_of=None):
+    """Every stage in one run: the GBA stages take the freshly cleaned PFP in memory instead of reloading the snapshot (unless as_of)."""
+    return run_stages_job(STAGES, site_url=site_url, pfp_folder=pfp_folder, workbook_structure_folder=workbook_structure_folder,
+                          old_pfp_folder=old_pfp_folder, gba_folder=gba_folder, as_of=as_of,
+                          low_memory=low_memory, incremental=incremental, compact=compact)
+
+def retry_gba_upload_job(publish_state):
+    """Republishes the workbooks that failed in an earlier GBA run."""
+    site_url, gba_folder, gba_frames, previous_results = publish_state
+    session = get_sharepoint_session(site_url, os.getenv('CLIENT_ID'), os.getenv('CLIENT_SECRET'))
+    report_progress("Retrying failed GBA uploads...")
+    results = publish_workbooks(session, gba_folder, gba_frames, previous_results=previous_results, ignore_columns=GBA_IGNORE_COLUMNS)
+    failed = any(result["status"] == "failed" for result in results.values())
+    return {"messages": gba_publish_messages(results), "gba_publish": (site_url, gba_folder, gba_frames, results) if failed else None}
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import info
+from pfp_schema import parquet_safe
+
+
+DEFAULT_INDEX_DIR = os.path.join(os.path.expanduser("~"), ".cache", "workforce_planning", "resource_index")
+# Checker columns carried into the GBA workbooks; 'Name' is the key
+CHECKER_COLUMNS = ['Person Number\n(from Department Tab)', 'File Name', 'Department Name', 'Department Manager', 'Name']
+
+
+def normalize_names(names):
+    """
+    Index key for resource names: case-insensitive, no-break spaces treated as spaces, inner
+    whitespace collapsed and ends stripped. Missing names stay missing. Each distinct name is
+    normalized once, so long PFP columns cost little more than a factorize.
+    """
+    codes, uniques = pd.factorize(pd.Series(names, copy=False))
+    normalized = (pd.Series(uniques, dtype=object).astype(str)
+                  .str.replace("\u00a0", " ", regex=False)
+                  .str.replace(r"\s+", " ", regex=True)
+                  .str.strip()
+                  .str.casefold())
+    normalized = normalized.where(normalized != "", np.nan).to_numpy(dtype=object)
+    keys = np.full(len(codes), np.nan, dtype=object)
+    keys[codes >= 0] = normalized[codes[codes >= 0]]
+    return pd.Series(keys, index=names.index if hasattr(names, "index") else None, name="Key")
+
+
+class ResourceIndex:
+    """
+    Normalized resource name -> (Person Number, File Name, Department, Manager) built from
+    the Checker sheet.
+
+    Each name maps to exactly one Checker row (the first one), so lookups never multiply
+    PFP rows the way a merge against repeated names does; repeated names are reported in
+    duplicates ('Name', 'rows', 'conflicting' when the repeats disagree).
+    """
+
+    def __init__(self, frame, duplicates, source=None):
+        self.frame = frame
+        self.duplicates = duplicates
+        self.source = source
+        # Trailing all-missing row that unmatched lookups point at
+        self._padded = frame.reset_index(drop=True).reindex(range(len(frame) + 1))
+
+    @classmethod
+    def from_checker(cls, checker, source=None):
+        checker = checker[CHECKER_COLUMNS]
+        keys = normalize_names(checker['Name'])
+        checker, keys = checker[keys.notna().values], keys[keys.notna()]
+        first = ~keys.duplicated(keep='first').values
+        frame = checker[first].set_axis(pd.Index(keys[first].to_numpy(), name="Key"))
+
+        repeated = keys.duplicated(keep=False).values
+        if repeated.any():
+            row_hashes = pd.util.hash_pandas_object(checker[repeated].drop(columns='Name'), index=False).values
+            groups = pd.DataFrame({"Key": keys[repeated].to_numpy(), "Name": checker['Name'][repeated].to_numpy(), "hash": row_hashes})
+            duplicates = groups.groupby("Key", sort=True).agg(Name=("Name", "first"), rows=("hash", "size"), conflicting=("hash", "nunique"))
+            duplicates["conflicting"] = duplicates["conflicting"] > 1
+        else:
+            duplicates = pd.DataFrame({"Name": pd.Series(dtype=object), "rows": pd.Series(dtype="int64"), "conflicting": pd.Series(dtype=bool)},
+                                      index=pd.Index([], name="Key"))
+        return cls(frame, duplicates, source)
+
+    def __len__(self):
+        return len(self.frame)
+
+    def positions(self, names):
+        """Row position in frame for each name, -1 when the name is not in the index."""
+        return self.frame.index.get_indexer(normalize_names(names).to_numpy())
+
+    def lookup(self, names):
+        """Checker columns for each name (missing when unmatched), one row per name with the index of names."""
+        positions = self.positions(names)
+        positions[positions < 0] = len(self.frame)
+        result = self._padded.iloc[positions]
+        result.index = names.index if hasattr(names, "index") else pd.RangeIndex(len(positions))
+        return result
+
+    def enrich(self, df, column='Resource'):
+        """df with the Checker columns appended, matched on column; same rows and row order as df."""
+        found = self.lookup(df[column])
+        return df.assign(**{col: found[col].to_numpy() for col in CHECKER_COLUMNS})
+
+    def unmatched(self, names):
+        """Distinct non-blank names that are not in the index, sorted."""
+        names = pd.Series(names, copy=False)
+        missing = (self.positions(names) < 0) & normalize_names(names).notna().to_numpy()
+        return sorted(names[missing].astype(str).unique())
+
+    def save(self, path):
+        """
+        Writes the index to path (Parquet) and its duplicates and source to path + '.json'.
+        Checker columns mixing Python types are stored as text (see pfp_schema.parquet_safe).
+        Nothing is left behind when the write fails.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        try:
+            parquet_safe(self.frame).to_parquet(tmp_path)
+            meta = {"source": self.source, "duplicates": self.duplicates.reset_index().to_dict(orient="records")}
+            with open(f"{tmp_path}.json", "w") as f:
+                json.dump(meta, f, default=str)
+            os.replace(tmp_path, path)
+            os.replace(f"{tmp_path}.json", f"{path}.json")
+        finally:
+            for leftover in (tmp_path, f"{tmp_path}.json"):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+
+    @classmethod
+    def load(cls, path):
+        with open(f"{path}.json") as f:
+            meta = json.load(f)
+        duplicates = pd.DataFrame(meta["duplicates"], columns=["Key", "Name", "rows", "conflicting"]).set_index("Key")
+        source = tuple(meta["source"]) if isinstance(meta["source"], list) else meta["source"]
+        return cls(pd.read_parquet(path), duplicates, source)
+
+
+def index_path(source, index_dir=None):
+    """On-disk location of the index built from the workbook with this source identity (URL, ETag...)."""
+    if index_dir is None:
+        cache_dir = os.getenv("WFP_CACHE_DIR")
+        index_dir = os.path.join(cache_dir, "resource_index") if cache_dir else DEFAULT_INDEX_DIR
+    key = hashlib.sha256(json.dumps(source, default=str).encode("utf-8")).hexdigest()
+    return os.path.join(index_dir, f"{key}.parquet")
+
+
+def get_resource_index(source, build, index_dir=None):
+    """
+    Returns the persisted index for the workbook identified by source, or build() and
+    persists it. build() may return None (no usable Checker), which is not persisted.
+    Without a source the index is always rebuilt.
+    """
+    path = index_path(source, index_dir) if source is not None else None
+    if path and os.path.exists(path) and os.path.exists(f"{path}.json"):
+        try:
+            index = ResourceIndex.load(path)
+            info(f"Loaded resource index ({len(index)} names) from {path}")
+            return index
+        except Exception as e:
+            print(f"Error reading resource index {path}, rebuilding: {e}")
+    index = build()
+    if index is not None and path:
+        # The persisted index is only a cache: a failed save costs a rebuild next time
+        try:
+            index.save(path)
+        except Exception as e:
+            print(f"Error saving resource index to {path}: {e}")
+    return index
@@ -0,0 +1,83 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class FolderTreeCache:
+    """
+    Cache of direct-subfolder listings keyed by server-relative folder URL.
+
+    Entries younger than ttl seconds are served as-is. Older entries are revalidated
+    with a cheap folder-version request (TimeLastModified/ItemCount, the folder's
+    ETag equivalent) and only re-listed when the version changed. A miss costs a single
+    request: the listing comes back with the version it is stored under.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+
+    def get_subfolders(self, session, folder_url):
+        with self._lock:
+            entry = self._entries.get(folder_url)
+        if entry is not None:
+            subfolders, version, fetched_at = entry
+            if time.time() - fetched_at < self.ttl:
+                with self._lock:
+                    self.hits += 1
+                return subfolders
+            if session.get_folder_version(folder_url) == version:
+                with self._lock:
+                    self.revalidations += 1
+                    self._entries[folder_url] = (subfolders, version, time.time())
+                return subfolders
+        subfolders, version = session.list_folders_with_version(folder_url)
+        with self._lock:
+            self.misses += 1
+            self._entries[folder_url] = (subfolders, version, time.time())
+        return subfolders
+
+    def invalidate(self, folder_url=None):
+        """Drops the cached listing for folder_url (and everything below it), or the whole cache."""
+        with self._lock:
+            if folder_url is None:
+                self._entries.clear()
+                return
+            prefix = folder_url.rstrip("/") + "/"
+            for url in [u for u in self._entries if u == folder_url or u.startswith(prefix)]:
+                del self._entries[url]
+
+
+# Shared by all callers in the process; server-relative URLs are unique per tenant
+folder_tree_cache = FolderTreeCache()
+
+
+def crawl_folder_tree(session, folder_path, max_workers=8, cache=None):
+    """
+    Lists all folders and subfolders below folder_path breadth-first, running the
+    listings of each level concurrently on a bounded worker pool.
+    Returns a list of tuples: (folder_name, folder_server_relative_url), level by level.
+    """
+    cache = cache or folder_tree_cache
+    folders_info = []
+    level = [folder_path]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while level:
+            next_level = []
+            for result in pool.map(lambda u: _safe_subfolders(session, cache, u), level):
+                folders_info.extend(result)
+                next_level.extend(sub_url for _, sub_url in result)
+            level = next_level
+    return folders_info
+
+
+def _safe_subfolders(session, cache, folder_url):
+    try:
+        return cache.get_subfolders(session, folder_url)
+    except Exception as e:
+        print(f"Error listing folders in {folder_url}: {e}")
+        return []
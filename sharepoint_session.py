@@ -0,0 +1,352 @@
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from instrumentation import round_trip
+
+
+# Refresh the app-only token this many seconds before SharePoint says it expires
+TOKEN_REFRESH_MARGIN = 300
+# Used only when the token response has no expiry; one hour errs on the side of refreshing early
+DEFAULT_TOKEN_LIFETIME = 3600
+# Files above this size are sent through a chunked upload session (simple uploads are capped by SharePoint)
+DEFAULT_UPLOAD_CHUNK_SIZE = 10 * 1024 * 1024
+UPLOAD_CHUNK_RETRIES = 3
+
+
+class SharePointSession:
+    """
+    One authenticated SharePoint client shared by every fetch/list/upload helper.
+
+    The app-only token is acquired once and reused until shortly before it expires,
+    and all requests go through a single keep-alive requests.Session. Each thread
+    gets its own ClientContext (ClientContext is not thread safe) built on the
+    shared token, so concurrent callers don't repeat the token handshake.
+
+    Every operation returns plain Python values (dicts, lists, bytes) so callers
+    don't depend on office365 objects and LocalSharePointSession can stand in for it.
+    """
+
+    def __init__(self, site_url, client_id, client_secret):
+        from office365.runtime.auth.client_credential import ClientCredential
+        from office365.runtime.auth.providers.acs_token_provider import ACSTokenProvider
+        import requests
+
+        self.site_url = site_url
+        self._token_provider = ACSTokenProvider(site_url, ClientCredential(client_id, client_secret))
+        self._token = None
+        self._token_expires_at = 0.0
+        self._token_generation = 0
+        self._http = requests.Session()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.stats = {"handshakes": 0, "round_trips": 0, "bytes_down": 0, "bytes_up": 0}
+
+    def _get_token(self):
+        """Returns the cached app-only token, acquiring a new one when it is about to expire."""
+        with self._lock:
+            if self._token is None or time.time() >= self._token_expires_at - TOKEN_REFRESH_MARGIN:
+                self._token = self._token_provider.get_app_only_access_token()
+                lifetime = getattr(self._token, "expiresIn", None)
+                lifetime = int(lifetime) if lifetime else DEFAULT_TOKEN_LIFETIME
+                self._token_expires_at = time.time() + lifetime
+                self._token_generation += 1
+                self.stats["handshakes"] += 1
+            return self._token
+
+    @property
+    def context(self):
+        """ClientContext for the calling thread, rebuilt whenever the token is refreshed."""
+        from office365.sharepoint.client_context import ClientContext
+
+        self._get_token()
+        ctx = getattr(self._local, "context", None)
+        if ctx is None or self._local.generation != self._token_generation:
+            ctx = ClientContext(self.site_url).with_access_token(self._get_token)
+            if hasattr(ctx, "with_transport"):
+                ctx.with_transport(session=self._http)
+            self._local.context = ctx
+            self._local.generation = self._token_generation
+        return ctx
+
+    def _count(self, bytes_down=0, bytes_up=0):
+        with self._lock:
+            self.stats["round_trips"] += 1
+            self.stats["bytes_down"] += bytes_down
+            self.stats["bytes_up"] += bytes_up
+
+    @staticmethod
+    def _file_info(props):
+        return {
+            "Name": props.get("Name"),
+            "ServerRelativeUrl": props.get("ServerRelativeUrl"),
+            "ETag": props.get("ETag"),
+            "TimeLastModified": props.get("TimeLastModified"),
+            "Length": int(props.get("Length") or 0),
+        }
+
+    @round_trip("list_files")
+    def list_files(self, folder_path):
+        """Returns a list of file info dicts (Name, ServerRelativeUrl, ETag, TimeLastModified, Length)."""
+        folder = self.context.web.get_folder_by_server_relative_url(folder_path)
+        files = folder.files.get().execute_query()
+        self._count()
+        return [self._file_info(f.properties) for f in files]
+
+    @round_trip("list_folders")
+    def list_folders(self, folder_path):
+        """Returns a list of (folder_name, folder_server_relative_url) for the direct subfolders."""
+        folder = self.context.web.get_folder_by_server_relative_url(folder_path)
+        folders = folder.folders.get().execute_query()
+        self._count()
+        return [(f.name, f.serverRelativeUrl) for f in folders]
+
+    @round_trip("list_folders_with_version")
+    def list_folders_with_version(self, folder_path):
+        """
+        Returns (subfolders, version): list_folders and get_folder_version of the folder in one
+        request, the subfolders being expanded into the folder's own properties.
+        """
+        folder = self.context.web.get_folder_by_server_relative_url(folder_path).expand(["Folders"]).get().execute_query()
+        self._count()
+        version = f'{folder.properties.get("TimeLastModified")}/{folder.properties.get("ItemCount")}'
+        return [(f.name, f.serverRelativeUrl) for f in folder.folders], version
+
+    @round_trip("get_file_properties")
+    def get_file_properties(self, file_url):
+        """Returns the file info dict for a single file (one metadata request)."""
+        f = self.context.web.get_file_by_server_relative_url(file_url).get().execute_query()
+        self._count()
+        return self._file_info(f.properties)
+
+    @round_trip("get_folder_version")
+    def get_folder_version(self, folder_path):
+        """
+        Returns a token that changes whenever the direct children of the folder change
+        (TimeLastModified plus item count), used to revalidate cached listings.
+        """
+        folder = self.context.web.get_folder_by_server_relative_url(folder_path).get().execute_query()
+        self._count()
+        return f'{folder.properties.get("TimeLastModified")}/{folder.properties.get("ItemCount")}'
+
+    @round_trip("download")
+    def download(self, file_url):
+        """Returns the raw bytes of the file at the given server-relative URL."""
+        from office365.sharepoint.files.file import File
+
+        response = File.open_binary(self.context, file_url)
+        response.raise_for_status()
+        self._count(bytes_down=len(response.content))
+        return response.content
+
+    @round_trip("upload", bytes_arg=2)
+    def upload(self, folder_path, file_name, content):
+        """Uploads bytes as folder_path/file_name, overwriting any existing file."""
+        folder = self.context.web.get_folder_by_server_relative_url(folder_path)
+        folder.upload_file(file_name, content).execute_query()
+        self._count(bytes_up=len(content))
+
+    @round_trip("upload_stream", bytes_arg=3)
+    def upload_stream(self, folder_path, file_name, stream, size, chunk_size=DEFAULT_UPLOAD_CHUNK_SIZE):
+        """
+        Uploads size bytes read from the seekable stream as folder_path/file_name without holding
+        the whole file in memory. Small files use a simple upload; larger ones a StartUpload/
+        ContinueUpload/FinishUpload session on a staging file that is moved over the target once
+        complete, so the existing file stays intact until then. A failed chunk is retried from
+        the offset the server last acknowledged; the session is only cancelled (and the staging
+        file deleted) when the retries run out.
+        """
+        if size <= chunk_size:
+            return self.upload(folder_path, file_name, stream.read())
+        from office365.runtime.queries.service_operation import ServiceOperationQuery
+
+        folder = self.context.web.get_folder_by_server_relative_url(folder_path)
+        upload_id = str(uuid.uuid4())
+        staging = folder.files.add(f"{file_name}.{upload_id[:8]}.uploading", b"", overwrite=True).execute_query()
+        self._count()
+        offset = 0
+        failures = 0
+        try:
+            while offset < size:
+                stream.seek(offset)
+                chunk = stream.read(chunk_size)
+                try:
+                    if offset == 0:
+                        staging.start_upload(upload_id, chunk).execute_query()
+                    elif offset + len(chunk) >= size:
+                        staging.finish_upload(upload_id, offset, chunk).execute_query()
+                    else:
+                        staging.continue_upload(upload_id, offset, chunk).execute_query()
+                except Exception as e:
+                    if failures == UPLOAD_CHUNK_RETRIES:
+                        raise
+                    time.sleep(2 ** failures)
+                    failures += 1
+                    # The failed request may still have reached the server: resume where it says the upload stands
+                    offset = self._acknowledged_offset(staging, upload_id, offset)
+                    print(f"Retrying '{file_name}' from offset {offset}: {e}")
+                    continue
+                self._count(bytes_up=len(chunk))
+                offset += len(chunk)
+                failures = 0
+            # Flag 1 (overwrite) replaces the target in one step
+            self.context.add_query(ServiceOperationQuery(staging, "moveto", {"newurl": f"{folder_path}/{file_name}", "flags": 1}))
+            self.context.execute_query()
+            self._count()
+        except Exception:
+            for cleanup in (lambda: staging.cancel_upload(upload_id), staging.delete_object):
+                try:
+                    cleanup().execute_query()
+                except Exception:
+                    pass
+            raise
+
+    def _acknowledged_offset(self, staging, upload_id, offset):
+        """Offset the chunk upload session expects next, or offset when the server can't tell."""
+        try:
+            status = staging.get_upload_status(upload_id).execute_query()
+            self._count()
+            return int(str(status.expected_content_range).split("-")[0])
+        except Exception:
+            return offset
+
+
+class LocalSharePointSession:
+    """
+    Filesystem-backed stand-in for SharePointSession.
+
+    Server-relative URLs are mapped onto files below root_dir, e.g.
+    "/teams/CPW_Testing/Shared Documents/x.xlsx" -> root_dir/teams/CPW_Testing/Shared Documents/x.xlsx.
+    Round trips and bytes are counted exactly like the real session so the savings
+    of caching and pooling can be measured without a tenant.
+    """
+
+    def __init__(self, root_dir, site_url=None):
+        self.root_dir = os.path.abspath(root_dir)
+        self.site_url = site_url
+        self._lock = threading.Lock()
+        self.stats = {"handshakes": 0, "round_trips": 0, "bytes_down": 0, "bytes_up": 0}
+
+    def _path(self, server_relative_url):
+        return os.path.join(self.root_dir, server_relative_url.lstrip("/"))
+
+    def _url(self, path):
+        return "/" + os.path.relpath(path, self.root_dir).replace(os.sep, "/")
+
+    def _count(self, bytes_down=0, bytes_up=0):
+        with self._lock:
+            # Mirror the real session: the first request performs the token handshake
+            if self.stats["handshakes"] == 0:
+                self.stats["handshakes"] = 1
+            self.stats["round_trips"] += 1
+            self.stats["bytes_down"] += bytes_down
+            self.stats["bytes_up"] += bytes_up
+
+    def _file_info(self, path):
+        st = os.stat(path)
+        return {
+            "Name": os.path.basename(path),
+            "ServerRelativeUrl": self._url(path),
+            "ETag": f'"{st.st_mtime_ns:x}-{st.st_size:x}"',
+            "TimeLastModified": datetime.fromtimestamp(st.st_mtime, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "Length": st.st_size,
+        }
+
+    @round_trip("list_files")
+    def list_files(self, folder_path):
+        path = self._path(folder_path)
+        self._count()
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"Folder not found: {folder_path}")
+        return [self._file_info(e.path) for e in sorted(os.scandir(path), key=lambda e: e.name) if e.is_file()]
+
+    @round_trip("list_folders")
+    def list_folders(self, folder_path):
+        path = self._path(folder_path)
+        self._count()
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"Folder not found: {folder_path}")
+        return [(e.name, self._url(e.path)) for e in sorted(os.scandir(path), key=lambda e: e.name) if e.is_dir()]
+
+    @round_trip("list_folders_with_version")
+    def list_folders_with_version(self, folder_path):
+        path = self._path(folder_path)
+        self._count()
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"Folder not found: {folder_path}")
+        # Versioned before listing so a change during the listing invalidates it next time
+        version = self._folder_version(path)
+        return [(e.name, self._url(e.path)) for e in sorted(os.scandir(path), key=lambda e: e.name) if e.is_dir()], version
+
+    @round_trip("get_file_properties")
+    def get_file_properties(self, file_url):
+        self._count()
+        return self._file_info(self._path(file_url))
+
+    @round_trip("get_folder_version")
+    def get_folder_version(self, folder_path):
+        self._count()
+        return self._folder_version(self._path(folder_path))
+
+    @staticmethod
+    def _folder_version(path):
+        return f"{os.stat(path).st_mtime_ns:x}/{len(os.listdir(path))}"
+
+    @round_trip("download")
+    def download(self, file_url):
+        with open(self._path(file_url), "rb") as f:
+            content = f.read()
+        self._count(bytes_down=len(content))
+        return content
+
+    @round_trip("upload", bytes_arg=2)
+    def upload(self, folder_path, file_name, content):
+        path = self._path(folder_path)
+        os.makedirs(path, exist_ok=True)
+        tmp_path = os.path.join(path, f".{file_name}.uploading")
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        shutil.move(tmp_path, os.path.join(path, file_name))
+        self._count(bytes_up=len(content))
+
+    @round_trip("upload_stream", bytes_arg=3)
+    def upload_stream(self, folder_path, file_name, stream, size, chunk_size=DEFAULT_UPLOAD_CHUNK_SIZE):
+        if size <= chunk_size:
+            return self.upload(folder_path, file_name, stream.read())
+        path = self._path(folder_path)
+        os.makedirs(path, exist_ok=True)
+        tmp_path = os.path.join(path, f".{file_name}.uploading")
+        with open(tmp_path, "wb") as f:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                f.write(chunk)
+                self._count(bytes_up=len(chunk))
+        shutil.move(tmp_path, os.path.join(path, file_name))
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_sharepoint_session(site_url, client_id, client_secret):
+    """
+    Returns the pooled session for (site_url, client_id), creating it on first use.
+    If the SHAREPOINT_LOCAL_ROOT environment variable is set, a LocalSharePointSession
+    rooted there is returned instead so the app can run without a tenant.
+    """
+    local_root = os.getenv("SHAREPOINT_LOCAL_ROOT")
+    key = (site_url, client_id, local_root)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            if local_root:
+                session = LocalSharePointSession(local_root, site_url)
+            else:
+                session = SharePointSession(site_url, client_id, client_secret)
+            _sessions[key] = session
+        return session
@@ -0,0 +1,166 @@
+import bisect
+import hashlib
+import json
+import re
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from instrumentation import info
+
+from pfp_sidecar import read_snapshot, sidecar_name
+
+
+MANIFEST_NAME = "snapshot-manifest.json"
+# Set in a manifest that may be missing snapshots (a failed update): lookups list the folder until it is rebuilt
+INVALID_KEY = "invalid"
+SNAPSHOT_PATTERN = re.compile(r"Project Plan Analysis-continuous-(\d{4}-\d{2}-\d{2})\.xlsx")
+
+
+def frame_checksum(df):
+    """sha256 over the column names and per-row content hashes of df (index ignored)."""
+    digest = hashlib.sha256("\x1f".join(map(str, df.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return "sha256:" + digest.hexdigest()
+
+
+def snapshot_date(file_name):
+    """'Project Plan Analysis-continuous-2024-01-31.xlsx' -> '2024-01-31', or None for other files."""
+    match = SNAPSHOT_PATTERN.fullmatch(file_name)
+    return match.group(1) if match else None
+
+
+def load_manifest(session, folder_path):
+    """Reads the manifest of folder_path (one request). Returns None when it is missing, unreadable or marked invalid."""
+    try:
+        manifest = json.loads(session.download(f"{folder_path}/{MANIFEST_NAME}"))
+    except Exception as e:
+        print(f"No usable snapshot manifest in '{folder_path}': {e}")
+        return None
+    if manifest.get(INVALID_KEY):
+        print(f"Snapshot manifest in '{folder_path}' is marked invalid ({manifest[INVALID_KEY]}); rebuild it with 'python cli.py rebuild-manifest'.")
+        return None
+    return manifest if isinstance(manifest.get("snapshots"), dict) else None
+
+
+def _manifest_to_update(session, folder_path, file_name):
+    """
+    The manifest record_snapshot adds file_name to. A new one is only started when the folder
+    holds no manifest file and no other snapshot (a manifest missing snapshots would hide them
+    from as_of lookups). Returns None when the manifest must be rebuilt instead; raises when it
+    cannot be read.
+    """
+    try:
+        content = session.download(f"{folder_path}/{MANIFEST_NAME}")
+    except Exception:
+        # Missing, or the download failed: only a listing tells them apart
+        files = session.list_files(folder_path)
+        if any(f["Name"] == MANIFEST_NAME for f in files):
+            raise
+        others = [f["Name"] for f in files if snapshot_date(f["Name"]) and f["Name"] != file_name]
+        if others:
+            print(f"No snapshot manifest in '{folder_path}', which already holds {len(others)} other snapshot(s); create it with 'python cli.py rebuild-manifest'.")
+            return None
+        return {"snapshots": {}}
+    manifest = json.loads(content)
+    if manifest.get(INVALID_KEY):
+        print(f"Snapshot manifest in '{folder_path}' is marked invalid ({manifest[INVALID_KEY]}); rebuild it with 'python cli.py rebuild-manifest'.")
+        return None
+    if not isinstance(manifest.get("snapshots"), dict):
+        raise ValueError(f"'{MANIFEST_NAME}' has no snapshots")
+    return manifest
+
+
+def invalidate_manifest(session, folder_path, reason):
+    """
+    Marks the manifest of folder_path invalid, so lookups list the folder instead of trusting
+    entries that may be missing the latest snapshot. Returns True on success.
+    """
+    marker = {INVALID_KEY: reason, "snapshots": {}, "updated_at": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+    try:
+        session.upload(folder_path, MANIFEST_NAME, json.dumps(marker, indent=2).encode("utf-8"))
+        print(f"Snapshot manifest in '{folder_path}' marked invalid; lookups list the folder until it is rebuilt with 'python cli.py rebuild-manifest'.")
+        return True
+    except Exception as e:
+        print(f"Error marking the snapshot manifest in '{folder_path}' invalid, lookups may return an older snapshot "
+              f"until it is rebuilt with 'python cli.py rebuild-manifest': {e}")
+        return False
+
+
+def save_manifest(session, folder_path, manifest):
+    manifest["updated_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    manifest["latest"] = max(manifest["snapshots"], default=None)
+    session.upload(folder_path, MANIFEST_NAME, json.dumps(manifest, indent=2, sort_keys=True, default=str).encode("utf-8"))
+
+
+def snapshot_entry(manifest, as_of=None):
+    """
+    The manifest entry of the latest snapshot, or of the latest one dated on or before
+    as_of ('YYYY-MM-DD' or a date). Returns None when there is no such snapshot.
+    """
+    snapshots = manifest["snapshots"]
+    if as_of is None:
+        date = manifest.get("latest") or max(snapshots, default=None)
+    else:
+        dates = sorted(snapshots)
+        position = bisect.bisect_right(dates, str(as_of)[:10])
+        date = dates[position - 1] if position else None
+    return dict(snapshots[date], date=date) if date in snapshots else None
+
+
+def _entry(file_info, sidecar_info, rows, checksum):
+    return {
+        "name": file_info["Name"],
+        "file": file_info,
+        "sidecar": sidecar_info,
+        "rows": int(rows),
+        "checksum": checksum,
+    }
+
+
+def record_snapshot(session, folder_path, file_name, df, has_sidecar=True, file_info=None):
+    """
+    Adds (or replaces) the entry for a snapshot just uploaded to folder_path, with its
+    file info (URL, ETag...; requested unless given), row count and frame_checksum, and
+    returns the entry (None when it was not recorded). When the update fails the manifest
+    is marked invalid (see invalidate_manifest): it would otherwise point lookups at the
+    previous snapshot.
+    """
+    date = snapshot_date(file_name)
+    if date is None:
+        return None
+    try:
+        manifest = _manifest_to_update(session, folder_path, file_name)
+        if manifest is None:
+            return None
+        file_info = file_info or session.get_file_properties(f"{folder_path}/{file_name}")
+        sidecar_info = session.get_file_properties(f"{folder_path}/{sidecar_name(file_name)}") if has_sidecar else None
+        manifest["snapshots"][date] = _entry(file_info, sidecar_info, len(df), frame_checksum(df))
+        save_manifest(session, folder_path, manifest)
+        info(f"Snapshot manifest updated: {date} -> '{file_name}' ({len(df)} rows)")
+        return manifest["snapshots"][date]
+    except Exception as e:
+        print(f"Error updating the snapshot manifest in '{folder_path}': {e}")
+        invalidate_manifest(session, folder_path, f"recording {date} failed: {e}")
+        return None
+
+
+def rebuild_manifest(session, folder_path):
+    """
+    Rebuilds the manifest from a full listing of folder_path, loading every snapshot
+    (from its sidecar when there is one) for the row count and checksum. Returns the manifest.
+    """
+    files = session.list_files(folder_path)
+    by_name = {f["Name"]: f for f in files}
+    manifest = {"snapshots": {}}
+    for f in sorted(files, key=lambda f: f["Name"]):
+        date = snapshot_date(f["Name"])
+        if date is None:
+            continue
+        sidecar = by_name.get(sidecar_name(f["Name"]))
+        sidecar_content = session.download(sidecar["ServerRelativeUrl"]) if sidecar else None
+        df, _ = read_snapshot(lambda f=f: session.download(f["ServerRelativeUrl"]), sidecar_content, f, sidecar)
+        manifest["snapshots"][date] = _entry(f, sidecar, len(df), frame_checksum(df))
+    save_manifest(session, folder_path, manifest)
+    info(f"Rebuilt the snapshot manifest of '{folder_path}' with {len(manifest['snapshots'])} snapshot(s)")
+    return manifest
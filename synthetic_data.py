@@ -0,0 +1,129 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from excel_writer import write_dataframe_xlsx
+
+
+# Excel sheets hold at most 1,048,576 rows including the header
+EXCEL_MAX_ROWS = 1_048_575
+
+# Org-name suffix -> relative weight; spelling variants mirror the real exports
+DEFAULT_SUFFIX_MIX = {
+    "MOB": 10, "Mobility": 5, "MOBILITY": 2,
+    "PLA": 12, "Places": 6, "PLACES": 2,
+    "RES": 8, "RESILIENCE": 3,
+    "EF": 6, "SSC": 4, "Services": 2,
+    "OPS": 3,
+}
+REGIONS = ["CA", "US", "UK", "NL", "AU", "IN", "DE", "FR"]
+
+
+def generate_pfp(rows, duplicate_rate=0.1, suffix_mix=None, n_employees=None, missing_employee_rate=0.01, seed=0):
+    """
+    Synthetic PFP export shaped like the Oracle 'Project Plan Analysis' extract.
+
+    duplicate_rate is the fraction of rows repeating an earlier (Project Number, Employee Name)
+    pair, i.e. an earlier 'Unique Code'. Each employee belongs to one organization whose
+    name ends with a suffix drawn from suffix_mix ({suffix: weight}).
+    Returns (pfp_df, employees_df) where employees_df lists name and organization per employee.
+    """
+    rng = np.random.default_rng(seed)
+    suffix_mix = suffix_mix or DEFAULT_SUFFIX_MIX
+    n_employees = n_employees or int(min(max(rows // 50, 200), 50_000))
+    n_projects = max(rows // 20, 100)
+
+    suffixes = np.array(list(suffix_mix))
+    weights = np.array(list(suffix_mix.values()), dtype=float)
+    n_orgs = max(len(suffixes) * 4, 40)
+    org_suffix = rng.choice(suffixes, n_orgs, p=weights / weights.sum())
+    org_names = np.array([f"{REGIONS[i % len(REGIONS)]} Org{i} {suffix}: Department {i % 13}" for i, suffix in enumerate(org_suffix)], dtype=object)
+
+    employee_names = np.array([f"Employee{i:06d}, Synthetic" for i in range(n_employees)], dtype=object)
+    employees = pd.DataFrame({"Employee Name": employee_names, "Expenditure Organization Name": org_names[rng.integers(0, n_orgs, n_employees)]})
+
+    # Distinct (project, employee) pairs first, then duplicates drawn from them
+    n_unique = max(int(rows * (1 - duplicate_rate)), 1)
+    pairs = np.unique(rng.integers(0, n_projects * n_employees, int(n_unique * 1.2) + 10))
+    pairs = rng.permutation(pairs)[:n_unique]
+    pairs = np.concatenate([pairs, pairs[rng.integers(0, len(pairs), rows - len(pairs))]])
+    pairs = rng.permutation(pairs)
+    project_idx, employee_idx = np.divmod(pairs, n_employees)
+
+    employee = employee_names[employee_idx].copy()
+    employee[rng.random(rows) < missing_employee_rate] = None
+    employee[rng.random(rows) < missing_employee_rate / 2] = "Labor Cost, Conversion Employee"
+    pfp = pd.DataFrame({
+        "Project Number": 30_000_000 + project_idx,
+        "Project Name": pd.Categorical.from_codes(project_idx % 5000, [f"Synthetic Project {i}" for i in range(5000)]).astype(object),
+        "Task Number": rng.integers(1, 40, rows).astype(str),
+        "Employee Name": employee,
+        "Resource": employee,
+        "Expenditure Organization Name": employees["Expenditure Organization Name"].values[employee_idx],
+        "Project Manager": employee_names[(project_idx * 7) % n_employees],
+        "Hours": rng.gamma(2.0, 20.0, rows).round(1),
+        "Period": rng.choice(pd.date_range("2025-01-01", periods=24, freq="MS").strftime("%b-%y").to_numpy(), rows),
+    })
+    return pfp, employees
+
+
+def generate_checker(employees, duplicate_name_rate=0.02, blank_person_rate=0.03, seed=0):
+    """
+    Synthetic 'Checker' sheet for the employees of generate_pfp: one row per employee plus
+    duplicate_name_rate repeated names, with blank_person_rate blank 'Person Number' cells.
+    """
+    rng = np.random.default_rng(seed + 1)
+    names = employees["Employee Name"].to_numpy()
+    duplicates = names[rng.integers(0, len(names), int(len(names) * duplicate_name_rate))]
+    names = np.concatenate([names, duplicates])
+    n = len(names)
+    person_number = pd.Series(rng.integers(100_000, 999_999, n), dtype="Int64")
+    person_number[rng.random(n) < blank_person_rate] = pd.NA
+    departments = [f"Department {i}" for i in range(40)]
+    return pd.DataFrame({
+        "Name": names,
+        "Person Number\n(from Department Tab)": person_number,
+        "File Name": rng.choice(["CPW_Tool_MOB_Main", "CPW_Tool_PLA_Main", "CPW_Tool_RES_Main", "CPW_Tool_EF_Main", "CPW_Tool_SSC_Main"], n),
+        "Department Name": rng.choice(departments, n),
+        "Department Manager": rng.choice([f"Manager{i:03d}, Synthetic" for i in range(60)], n),
+    })
+
+
+def write_workbook_structure(path, checker, filler_sheets=3, filler_rows=2000, seed=0):
+    """
+    Writes a Workbook Structure workbook: 'Checker' with a title row above the header,
+    'Dropdown' with the header on the first row, and filler sheets that are never used.
+    """
+    rng = np.random.default_rng(seed + 2)
+    # Written through a file handle: pandas only accepts the .xlsm extension for openpyxl
+    with open(path, "wb") as f, pd.ExcelWriter(f, engine="xlsxwriter") as writer:
+        checker.to_excel(writer, sheet_name="Checker", index=False, startrow=1)
+        writer.sheets["Checker"].write(0, 0, "Checker")
+        pd.DataFrame({"GBA": ["MOB", "PLA", "RES", "EF", "SSC"]}).to_excel(writer, sheet_name="Dropdown", index=False)
+        for i in range(filler_sheets):
+            filler = pd.DataFrame(rng.random((filler_rows, 12)), columns=[f"Col{j}" for j in range(12)])
+            filler.to_excel(writer, sheet_name=f"Sheet{i + 1}", index=False, startrow=1)
+
+
+def write_local_sharepoint(root_dir, pfp, checker, pfp_folder, workbook_structure_folder, extra_folders=()):
+    """
+    Lays the synthetic inputs out below root_dir the way LocalSharePointSession maps
+    server-relative URLs. The PFP export is only written as .xlsx when it fits in one
+    sheet; returns the .xlsx path or None.
+    """
+    def local(url):
+        path = os.path.join(root_dir, url.lstrip("/"))
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    for folder in extra_folders:
+        local(folder)
+    write_workbook_structure(os.path.join(local(workbook_structure_folder), "Workbook Structure.xlsm"), checker)
+    pfp_dir = local(pfp_folder)
+    if len(pfp) > EXCEL_MAX_ROWS:
+        return None
+    pfp_path = os.path.join(pfp_dir, "Project Plan Analysis-continuous.xlsx")
+    with open(pfp_path, "wb") as f:
+        write_dataframe_xlsx(pfp, f)
+    return pfp_path
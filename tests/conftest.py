@@ -0,0 +1,80 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# 'Expenditure Organization Name' values the GBA split has to agree on: every spelling in
+# SUFFIX_MAP, case and whitespace variants, multi-word suffixes, names without ':' or
+# without a space, unknown suffixes and non-string cells as openpyxl returns them
+ORG_NAMES = [
+    "CA Org1 MOB: Department 1",
+    "CA Org2 Mobility: Department 2",
+    "US Org3 MOBILITY: Department 3",
+    "UK Org4 mob: Department 4",
+    "NL Org5 PLA: Department 5",
+    "AU Org6 Places: Department 6",
+    "IN Org7 PLACES",
+    "DE Org8 places : Department 8",
+    "FR Org9 RES: Department 9",
+    "CA Org10 Resilience: Department 10",
+    "US Org11 EF: Department 11",
+    "UK Org12 Enabling Function: Department 12",
+    "NL Org13 ENABLING FUNCTION: Department 13",
+    "AU Org14 SSC: Department 14",
+    "IN Org15 Shared Services: Department 15",
+    "DE Org16 SHARED SERVICES",
+    "FR Org17 Services: Department 17",
+    "CA Org18 OPS: Department 18",
+    "MOB",
+    "  PLA  : leading and trailing blanks",
+    "SSC:no space after the colon",
+    "Org19 RES: Department: with a second colon",
+    "Org20 EF:",
+    ": Department without a prefix",
+    "",
+    12345,
+    3.5,
+    True,
+]
+
+
+@pytest.fixture
+def gba_regression_frame():
+    """A merged PFP frame shaped like the GBA split input, one row per ORG_NAMES value, repeated out of order."""
+    names = ORG_NAMES * 3
+    rows = len(names)
+    return pd.DataFrame({
+        'Unique Code': [f"{30000000 + i} - Employee{i:06d}, Synthetic" for i in range(rows)],
+        'Project Number': [30000000 + i for i in range(rows)],
+        'Project Name': [f"Synthetic Project {i % 7}" for i in range(rows)],
+        'Resource': [f"Employee{i:06d}, Synthetic" for i in range(rows)],
+        'Expenditure Organization Name': pd.Series(names, dtype=object),
+        'Person Number\n(from Department Tab)': [str(1000 + i) for i in range(rows)],
+        'File Name': [f"Workbook {i % 4}" for i in range(rows)],
+        'Department Manager': [f"Manager {i % 5}" for i in range(rows)],
+    }, index=pd.RangeIndex(rows)[::-1])
+
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    """
+    An empty LocalSharePointSession under tmp_path, with the download cache, the resource index
+    cache and the history store there too and an empty frame cache, so tests share no state.
+    """
+    import history_store
+    import pipeline
+    from download_cache import DownloadCache
+    from jobs import get_frame_cache
+    from sharepoint_session import LocalSharePointSession
+
+    monkeypatch.setenv("WFP_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(pipeline, "get_download_cache", lambda cache=DownloadCache(str(tmp_path / "downloads")): cache)
+    monkeypatch.setattr(history_store, "_history_store", history_store.HistoryStore(str(tmp_path / "history")))
+    get_frame_cache().clear()
+    return LocalSharePointSession(str(tmp_path / "sharepoint"))
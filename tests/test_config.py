@@ -0,0 +1,41 @@
+import functools
+import importlib
+
+import dotenv
+import pytest
+
+import config
+
+
+@pytest.fixture
+def reload_config(monkeypatch):
+    """Reloads config with load_dotenv() reading the given .env file; the real settings are restored afterwards."""
+    def reload(env_file, *names):
+        for name in names:
+            # Recorded by monkeypatch so whatever load_dotenv sets is removed again
+            monkeypatch.setenv(name, "")
+            monkeypatch.delenv(name)
+        monkeypatch.setattr(dotenv, "load_dotenv", functools.partial(dotenv.load_dotenv, env_file))
+        return importlib.reload(config)
+
+    yield reload
+    monkeypatch.undo()
+    importlib.reload(config)
+
+
+def test_env_file_overrides_the_defaults(reload_config, tmp_path):
+    env_file = tmp_path / ".env"
+    env_file.write_text('WFP_PFP_FOLDER="/teams/Other/Shared Documents/PFP"\nWFP_VERBOSITY=0\n')
+    settings = reload_config(str(env_file), "WFP_PFP_FOLDER", "WFP_OLD_PFP_FOLDER", "WFP_VERBOSITY")
+    assert settings.PFP_FOLDER == "/teams/Other/Shared Documents/PFP"
+    assert settings.OLD_PFP_FOLDER == "/teams/Other/Shared Documents/PFP/OLD PFP"
+    assert settings.VERBOSITY == 0
+
+
+def test_environment_wins_over_env_file(reload_config, tmp_path, monkeypatch):
+    env_file = tmp_path / ".env"
+    env_file.write_text('WFP_GBA_FOLDER="/from/env/file"\n')
+    settings = reload_config(str(env_file), "WFP_GBA_FOLDER")
+    assert settings.GBA_FOLDER == "/from/env/file"
+    monkeypatch.setenv("WFP_GBA_FOLDER", "/from/environment")
+    assert reload_config(str(env_file)).GBA_FOLDER == "/from/environment"
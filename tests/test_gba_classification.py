@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from gba_classification import GBA_KEYS, split_by_gba
+from synthetic_data import generate_pfp
+
+
+def five_pass_split(merged_df):
+    """The split as it was before split_by_gba: one apply() mask per GBA over the suffix of each name."""
+    suffix_map = {
+        "MOB": ["MOB", "MOBILITY", "Mobility"],
+        "PLA": ["PLA", "PLACES", "Places"],
+        "RES": ["RES", "RESILIENCE"],
+        "EF": ["EF", "Enabling Function", "ENABLING FUNCTION"],
+        "SSC": ["SSC", "SHARED SERVICES", "Shared Services"]
+    }
+
+    def normalize_suffix(s):
+        return str(s).strip().upper()
+
+    def get_suffix(org_name):
+        val = str(org_name).split(':')[0].strip()
+        parts = val.rsplit(' ', 1)
+        return parts[-1] if len(parts) > 1 else parts[0]
+
+    filtered_dfs = {}
+    for key, values in suffix_map.items():
+        mask = merged_df['Expenditure Organization Name'].dropna().apply(
+            lambda x: any(normalize_suffix(get_suffix(x)) == v.upper() for v in values)
+        )
+        filtered_dfs[key] = merged_df[mask]
+    return filtered_dfs
+
+
+def assert_same_split(actual, expected):
+    assert list(actual) == GBA_KEYS
+    for key in GBA_KEYS:
+        pd.testing.assert_frame_equal(actual[key], expected[key], obj=f"GBA {key}")
+
+
+def test_split_matches_five_pass_implementation(gba_regression_frame):
+    assert_same_split(split_by_gba(gba_regression_frame), five_pass_split(gba_regression_frame))
+
+
+def test_split_matches_five_pass_implementation_on_synthetic_export():
+    pfp, _ = generate_pfp(5000, seed=7)
+    merged = pfp.dropna(subset=['Expenditure Organization Name'])
+    assert_same_split(split_by_gba(merged), five_pass_split(merged))
+
+
+def test_split_covers_every_gba_and_keeps_columns(gba_regression_frame):
+    empty = gba_regression_frame[~gba_regression_frame['Expenditure Organization Name'].astype(str).str.contains("MOB", case=False)]
+    groups = split_by_gba(empty)
+    assert groups["MOB"].empty
+    assert list(groups["MOB"].columns) == list(gba_regression_frame.columns)
+
+
+@pytest.mark.filterwarnings("ignore:Boolean Series key will be reindexed")
+def test_blank_names_are_unclassified(gba_regression_frame):
+    # The five-pass masks were built from a dropna()'d series and failed on blank names
+    df = gba_regression_frame.copy()
+    df.loc[df.index[:4], 'Expenditure Organization Name'] = [None, np.nan, pd.NA, None]
+    with pytest.raises(pd.errors.IndexingError):
+        five_pass_split(df)
+    groups = split_by_gba(df)
+    expected = five_pass_split(df.iloc[4:])
+    assert_same_split(groups, expected)
@@ -0,0 +1,14 @@
+import pandas as pd
+
+from history_store import HistoryStore
+
+
+def test_append_with_a_mixed_type_column(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    # 'Person Number' as openpyxl returns it from a hand-edited sheet
+    df = pd.DataFrame({'Resource': ["A", "B", "C"], 'Person Number': pd.Series([1001, "N/A", 1003.0], dtype=object)})
+    assert store.append("gba", "2024-06-30", df, GBA="MOB") is not None
+    assert store.append("gba", "2024-06-30", df, GBA="MOB") is None
+    read = store.read("gba", columns=['Resource', 'Person Number'])
+    assert read['Person Number'].tolist() == ["1001", "N/A", "1003.0"]
+    assert read['GBA'].tolist() == ["MOB"] * 3
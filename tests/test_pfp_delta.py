@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pfp_delta import RowDigest, column_hashes
+from pfp_schema import to_compact
+from pfp_sidecar import dataframe_to_sidecar_bytes, read_snapshot
+from pipeline import first_time_run_pfp, first_time_run_pfp_delta
+from synthetic_data import generate_pfp
+
+
+@pytest.fixture
+def export():
+    pfp, _ = generate_pfp(3000, seed=3)
+    return pfp
+
+
+@pytest.fixture
+def snapshot(export):
+    return first_time_run_pfp(export.copy())
+
+
+def changed_export(export, snapshot):
+    """The export with 3 snapshot rows edited, every row of 4 other snapshot keys dropped and 2 rows added."""
+    current = export.copy()
+    current.loc[snapshot.index[:3], 'Hours'] += 1
+    dropped = snapshot.loc[snapshot.index[3:7], ['Project Number', 'Employee Name']]
+    pairs = pd.MultiIndex.from_frame(current[['Project Number', 'Employee Name']])
+    current = current[~pairs.isin(pd.MultiIndex.from_frame(dropped))]
+    added = current.iloc[:2].assign(**{'Employee Name': ["Newcomer1, Synthetic", "Newcomer2, Synthetic"]})
+    return pd.concat([current, added], ignore_index=True)
+
+
+def test_counts_added_removed_and_modified_rows(export, snapshot):
+    current = changed_export(export, snapshot)
+    df_final, manifest, digest = first_time_run_pfp_delta(current.copy(), RowDigest.of(snapshot))
+    assert manifest == {
+        "previous_rows": len(snapshot),
+        "rows": len(snapshot) + 2 - 4,
+        "unchanged": len(snapshot) - 7,
+        "added": 2,
+        "modified": 3,
+        "removed": 4,
+    }
+    pd.testing.assert_frame_equal(df_final, first_time_run_pfp(current.copy()))
+    assert len(digest) == len(df_final)
+
+
+def test_unchanged_export_keeps_every_row(export, snapshot):
+    df_final, manifest, _ = first_time_run_pfp_delta(export.copy(), RowDigest.of(snapshot))
+    assert (manifest["unchanged"], manifest["added"], manifest["modified"], manifest["removed"]) == (len(snapshot), 0, 0, 0)
+    pd.testing.assert_frame_equal(df_final, snapshot)
+
+
+def test_int_column_read_as_float_is_not_a_change(export, snapshot):
+    # One added row with a blank 'Project Number' turns the column into float
+    blank = export.iloc[:1].assign(**{'Project Number': np.nan, 'Employee Name': "Newcomer, Synthetic"})
+    current = pd.concat([export, blank], ignore_index=True)
+    assert current['Project Number'].dtype == np.float64
+    _, manifest, _ = first_time_run_pfp_delta(current, RowDigest.of(snapshot))
+    assert (manifest["unchanged"], manifest["added"], manifest["modified"], manifest["removed"]) == (len(snapshot), 1, 0, 0)
+
+
+def test_compact_and_plain_frames_hash_alike(snapshot):
+    plain = RowDigest.of(snapshot)
+    compact = RowDigest.of(to_compact(snapshot.copy()))
+    np.testing.assert_array_equal(plain.keys, compact.keys)
+    np.testing.assert_array_equal(plain.hashes, compact.hashes)
+
+
+def test_column_hashes_normalize_numbers_and_missing_values():
+    as_int = column_hashes(pd.Series([12, 30000001]))
+    as_float = column_hashes(pd.Series([12.0, 30000001.0]))
+    as_object = column_hashes(pd.Series([12, "30000001"], dtype=object))
+    np.testing.assert_array_equal(as_int, as_float)
+    assert as_object[0] == as_int[0] and as_object[1] != as_int[1]
+    missing = [column_hashes(pd.Series(values))[-1] for values in ([1.0, np.nan], ["a", None], pd.Categorical(["a", None]))]
+    assert len(set(missing)) == 1
+
+
+def test_digest_travels_with_the_sidecar(snapshot):
+    digest = RowDigest.of(snapshot)
+    content = dataframe_to_sidecar_bytes(snapshot, "etag", digest)
+    stored = RowDigest.from_sidecar(content)
+    np.testing.assert_array_equal(stored.keys, digest.keys)
+    np.testing.assert_array_equal(stored.hashes, digest.hashes)
+    assert stored.columns == digest.columns
+    df, source = read_snapshot(None, content)
+    assert source == "parquet"
+    pd.testing.assert_frame_equal(df, snapshot.reset_index(drop=True))
+    assert RowDigest.from_sidecar(dataframe_to_sidecar_bytes(snapshot, "etag")) is None
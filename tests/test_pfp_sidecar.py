@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from pfp_delta import RowDigest
+from pfp_schema import parquet_safe, to_compact
+from pfp_sidecar import dataframe_to_sidecar_bytes, read_snapshot, upload_sidecar
+
+
+def mixed_frame():
+    """A snapshot-shaped frame whose 'Project Number' mixes ints, text and floats, as openpyxl returns them."""
+    return pd.DataFrame({
+        'Unique Code': ["1001 - A", "N/A - B", "1003.0 - C", "nan - D"],
+        'Project Number': pd.Series([1001, "N/A", 1003.0, None], dtype=object),
+        'Employee Name': ["A", "B", "C", "D"],
+        'Hours': [1.0, 2.0, 3.0, 4.0],
+    })
+
+
+def test_parquet_safe_converts_only_mixed_columns():
+    df = mixed_frame()
+    safe = parquet_safe(df)
+    assert safe['Project Number'].tolist()[:3] == ["1001", "N/A", "1003.0"]
+    assert safe['Project Number'].isna().tolist() == [False, False, False, True]
+    pd.testing.assert_series_equal(safe['Hours'], df['Hours'])
+    assert df['Project Number'].tolist()[0] == 1001
+    clean = df.drop(columns='Project Number')
+    assert parquet_safe(clean) is clean
+    compact = parquet_safe(to_compact(df.copy(), ['Project Number']))
+    assert isinstance(compact['Project Number'].dtype, pd.CategoricalDtype)
+    assert sorted(compact['Project Number'].cat.categories) == ["1001", "1003.0", "N/A"]
+
+
+def test_sidecar_with_a_mixed_type_column(session):
+    df = mixed_frame()
+    digest = RowDigest.of(df)
+    assert upload_sidecar(session, "/teams/Testing/Shared Documents/OLD PFP", "snapshot.xlsx", df, "etag", digest)
+    content = dataframe_to_sidecar_bytes(df, "etag", digest)
+    stored = RowDigest.from_sidecar(content)
+    np.testing.assert_array_equal(stored.hashes, digest.hashes)
+    loaded, source = read_snapshot(None, content)
+    assert source == "parquet"
+    assert loaded['Project Number'].tolist()[:3] == ["1001", "N/A", "1003.0"] and pd.isna(loaded['Project Number'].iloc[3])
+    pd.testing.assert_frame_equal(loaded.drop(columns='Project Number'), df.drop(columns='Project Number'), check_dtype=False)
@@ -0,0 +1,74 @@
+import pytest
+
+import history_store
+import pipeline
+from config import GBA_FOLDER, OLD_PFP_FOLDER, PFP_FOLDER, WORKBOOK_STRUCTURE_FOLDER
+from pipeline import FIRST_RUN_STAGES, STAGES, PipelineRun
+from synthetic_data import generate_checker, generate_pfp, write_local_sharepoint
+
+
+@pytest.fixture
+def session(session):
+    """The local SharePoint holding a synthetic PFP export and Workbook Structure."""
+    pfp, employees = generate_pfp(600, seed=11)
+    write_local_sharepoint(session.root_dir, pfp, generate_checker(employees, seed=11), PFP_FOLDER, WORKBOOK_STRUCTURE_FOLDER,
+                           extra_folders=[OLD_PFP_FOLDER, GBA_FOLDER])
+    return session
+
+
+def test_published_snapshot_is_added_to_the_history(session):
+    ok, _ = PipelineRun(session=session).run(FIRST_RUN_STAGES)
+    assert ok
+    store = history_store.get_history_store()
+    assert len(store.parts("pfp")) == 1
+    assert "Unique Code" in store.read("pfp").columns
+
+
+def test_low_memory_run_leaves_the_history_alone(session):
+    ok, _ = PipelineRun(session=session, low_memory=True).run(FIRST_RUN_STAGES)
+    assert ok
+    assert history_store.get_history_store().dates("pfp") == []
+
+
+def test_failed_publish_leaves_the_history_alone(session, monkeypatch):
+    monkeypatch.setattr(pipeline, "upload_dataframe_to_sharepoint_folder", lambda *args, **kwargs: False)
+    ok, messages = PipelineRun(session=session).run(FIRST_RUN_STAGES)
+    assert not ok and messages[-1][0] == "error"
+    assert history_store.get_history_store().dates("pfp") == []
+
+
+def test_full_run_job_takes_the_folder_overrides(session, monkeypatch):
+    folders = {name: f"/teams/Other/Shared Documents/{name}" for name in ("pfp_folder", "workbook_structure_folder", "old_pfp_folder", "gba_folder")}
+    pfp, employees = generate_pfp(300, seed=5)
+    write_local_sharepoint(session.root_dir, pfp, generate_checker(employees, seed=5), folders["pfp_folder"], folders["workbook_structure_folder"],
+                           extra_folders=[folders["old_pfp_folder"], folders["gba_folder"]])
+    # The job opens its own session on the same folders
+    monkeypatch.setenv("SHAREPOINT_LOCAL_ROOT", session.root_dir)
+
+    result = pipeline.full_run_job(site_url="https://example.sharepoint.com/teams/Other", **folders)
+    assert all(level != "error" for level, _ in result["messages"]), result["messages"]
+    assert any(f["Name"].startswith("Project Plan Analysis-continuous-") for f in session.list_files(folders["old_pfp_folder"]))
+    assert any(f["Name"].startswith("CPW_Tool_") for f in session.list_files(folders["gba_folder"]))
+
+
+def test_gba_history_holds_only_published_workbooks(session, monkeypatch):
+    publish = pipeline.publish_workbooks
+
+    def publish_failing_mob(*args, **kwargs):
+        results = publish(*args, **kwargs)
+        results["CPW_Tool_MOB_Main.xlsx"] = {"status": "failed", "error": "timeout", "attempts": 3, "bytes": 0}
+        return results
+
+    monkeypatch.setattr(pipeline, "publish_workbooks", publish_failing_mob)
+    run = PipelineRun(session=session)
+    ok, _ = run.run(STAGES)
+    assert not ok and run.publish_state is not None
+    gbas = {values["GBA"] for _, values in history_store.get_history_store().parts("gba")}
+    assert gbas == set(run.outputs["classify"]) - {"MOB"}
+    assert not {'Oracle Date', 'Index'} & set(history_store.get_history_store().read("gba").columns)
+
+
+def test_gba_history_is_not_written_before_publishing(session):
+    ok, _ = PipelineRun(session=session).run(FIRST_RUN_STAGES + ("load_checker", "merge", "classify"))
+    assert ok
+    assert history_store.get_history_store().dates("gba") == []
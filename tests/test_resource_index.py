@@ -0,0 +1,135 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from resource_index import CHECKER_COLUMNS, ResourceIndex, get_resource_index, index_path, normalize_names
+
+
+def checker_rows(*rows):
+    """A cleaned Checker frame from (Name, Person Number, Department Name) tuples."""
+    return pd.DataFrame({
+        'Person Number\n(from Department Tab)': [number for _, number, _ in rows],
+        'File Name': ["Workbook 1"] * len(rows),
+        'Department Name': [department for _, _, department in rows],
+        'Department Manager': ["Manager 1"] * len(rows),
+        'Name': [name for name, _, _ in rows],
+    })
+
+
+@pytest.fixture
+def checker():
+    return checker_rows(
+        ("Smith, Anna", "1001", "Dept A"),
+        ("Jones, Bob", "1002", "Dept B"),
+        ("SMITH,  anna", "1001", "Dept A"),  # same person, same row after normalizing
+        ("Lee, Chris", "1003", "Dept C"),
+        ("lee,\u00a0chris ", "9999", "Dept Z"),  # same key (no-break space), different row
+        ("", "1004", "Dept D"),
+        (None, "1005", "Dept E"),
+    )
+
+
+@pytest.fixture
+def pfp():
+    return pd.DataFrame({
+        'Unique Code': [f"{i} - row" for i in range(7)],
+        'Resource': ["Smith, Anna", " smith, ANNA ", "Lee, Chris", "Unknown, Dana", None, "Jones, Bob", "Unknown, Dana"],
+    }, index=pd.RangeIndex(7)[::-1])
+
+
+def test_normalize_names():
+    keys = normalize_names(pd.Series(["  Smith,  Anna ", "SMITH, ANNA", "", None]))
+    assert keys[:2].tolist() == ["smith, anna", "smith, anna"]
+    assert keys[2:].isna().all()
+
+
+def test_enrich_keeps_one_row_per_pfp_row(checker, pfp):
+    index = ResourceIndex.from_checker(checker)
+    enriched = index.enrich(pfp)
+    assert len(enriched) == len(pfp)
+    pd.testing.assert_index_equal(enriched.index, pfp.index)
+    assert enriched['Unique Code'].tolist() == pfp['Unique Code'].tolist()
+    # The first Checker row wins for repeated names
+    assert enriched['Person Number\n(from Department Tab)'].tolist() == ["1001", "1001", "1003", np.nan, np.nan, "1002", np.nan]
+    assert enriched['Department Name'].iloc[2] == "Dept C"
+    assert list(enriched.columns) == list(pfp.columns) + CHECKER_COLUMNS
+
+
+def test_duplicates_report_repeats_and_conflicts(checker):
+    index = ResourceIndex.from_checker(checker)
+    assert len(index) == 3
+    duplicates = index.duplicates
+    assert duplicates.index.tolist() == ["lee, chris", "smith, anna"]
+    assert duplicates["Name"].tolist() == ["Lee, Chris", "Smith, Anna"]
+    assert duplicates["rows"].tolist() == [2, 2]
+    # The Smith rows differ only in the spelling of the name, which is not a conflict
+    assert duplicates["conflicting"].tolist() == [True, False]
+
+
+def test_no_duplicates():
+    index = ResourceIndex.from_checker(checker_rows(("Smith, Anna", "1001", "Dept A"), ("Jones, Bob", "1002", "Dept B")))
+    assert index.duplicates.empty
+    assert list(index.duplicates.columns) == ["Name", "rows", "conflicting"]
+
+
+def test_unmatched_names(checker, pfp):
+    index = ResourceIndex.from_checker(checker)
+    names = pd.concat([pfp['Resource'], pd.Series(["Adams, Zoe", "  ", "LEE, CHRIS"])])
+    assert index.unmatched(names) == ["Adams, Zoe", "Unknown, Dana"]
+
+
+def test_save_and_load_round_trip(checker, tmp_path):
+    index = ResourceIndex.from_checker(checker, source=("url", "etag", "2024-06-30T00:00:00Z"))
+    path = str(tmp_path / "index" / "checker.parquet")
+    index.save(path)
+    loaded = ResourceIndex.load(path)
+    pd.testing.assert_frame_equal(loaded.frame, index.frame)
+    pd.testing.assert_frame_equal(loaded.duplicates, index.duplicates, check_dtype=False)
+    assert loaded.source == index.source
+    names = pd.Series(["Smith, Anna", "Unknown, Dana", "lee, chris"])
+    pd.testing.assert_frame_equal(loaded.lookup(names), index.lookup(names))
+
+
+def test_get_resource_index_builds_once_per_source(checker, tmp_path):
+    built = []
+
+    def build():
+        built.append(1)
+        return ResourceIndex.from_checker(checker, source)
+
+    source = ("url", "etag-1")
+    first = get_resource_index(source, build, str(tmp_path))
+    second = get_resource_index(source, build, str(tmp_path))
+    assert len(built) == 1
+    pd.testing.assert_frame_equal(second.frame, first.frame)
+    get_resource_index(("url", "etag-2"), build, str(tmp_path))
+    assert len(built) == 2
+    # Without a source, or when build() finds no Checker, nothing is persisted
+    get_resource_index(None, build, str(tmp_path))
+    assert len(built) == 3
+    assert get_resource_index(("url", "etag-3"), lambda: None, str(tmp_path)) is None
+    assert not os.path.exists(index_path(("url", "etag-3"), str(tmp_path)))
+
+
+def test_mixed_type_checker_column_is_persisted(tmp_path):
+    # 'Person Number' as openpyxl returns it from a hand-edited sheet
+    checker = checker_rows(("Smith, Anna", 1001, "Dept A"), ("Jones, Bob", "N/A", "Dept B"), ("Lee, Chris", 1003.0, "Dept C"))
+    source = ("url", "etag")
+    index = get_resource_index(source, lambda: ResourceIndex.from_checker(checker, source), str(tmp_path))
+    assert index.lookup(pd.Series(["Jones, Bob"]))['Person Number\n(from Department Tab)'].tolist() == ["N/A"]
+    path = index_path(source, str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == sorted([os.path.basename(path), os.path.basename(path) + ".json"])
+    loaded = get_resource_index(source, lambda: None, str(tmp_path))
+    assert loaded.lookup(pd.Series(["Smith, Anna", "Lee, Chris"]))['Person Number\n(from Department Tab)'].tolist() == ["1001", "1003.0"]
+
+
+def test_failed_save_still_returns_the_index(checker, tmp_path, monkeypatch):
+    def fail(*args, **kwargs):
+        raise ValueError("cannot write")
+
+    monkeypatch.setattr(pd.DataFrame, "to_parquet", fail)
+    index = get_resource_index(("url", "etag"), lambda: ResourceIndex.from_checker(checker), str(tmp_path))
+    assert len(index) == 3
+    assert os.listdir(tmp_path) == []
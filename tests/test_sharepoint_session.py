@@ -0,0 +1,153 @@
+import io
+import threading
+
+import pytest
+
+import sharepoint_session
+from sharepoint_session import SharePointSession
+
+
+pytest.importorskip("office365")
+
+FOLDER = "/teams/Testing/Shared Documents/OLD PFP"
+TARGET = f"{FOLDER}/snapshot.xlsx"
+CONTENT = bytes(range(45))
+CHUNK = 10
+
+
+class Request:
+    """What the office365 query methods return: execute_query() sends the request."""
+
+    def __init__(self, send=lambda: None):
+        self.send = send
+
+    def execute_query(self):
+        return self.send()
+
+
+class FakeServer:
+    """
+    The SharePoint REST endpoints upload_stream talks to, as a client context: folder.files.add
+    creates the staging file and the moveto query replaces the target with it. failures maps a
+    chunk offset to 'lost' (the request never reaches the server) or 'stored' (the chunk is
+    stored but the response is lost); each happens once unless persistent.
+    """
+
+    def __init__(self, stored=None, failures=None, persistent=False):
+        self.stored = dict(stored or {})
+        self.failures = dict(failures or {})
+        self.persistent = persistent
+        self.requests = []
+        self.queries = []
+        self.staging = None
+        self.web = self
+        self.files = self
+
+    def get_folder_by_server_relative_url(self, folder_path):
+        self.folder_path = folder_path
+        return self
+
+    def add(self, name, content, overwrite=True):
+        self.staging = FakeStagingFile(self, f"{self.folder_path}/{name}")
+        self.stored[self.staging.url] = content
+        return Request(lambda: self.staging)
+
+    def add_query(self, query):
+        self.queries.append(query)
+
+    def execute_query(self):
+        query = self.queries.pop()
+        assert query.binding_type is self.staging and query.name == "moveto"
+        self.stored[query._method_params["newurl"]] = self.stored.pop(self.staging.url)
+
+
+class FakeStagingFile:
+    def __init__(self, server, url):
+        self.server = server
+        self.context = server
+        self.url = url
+        self.received = b""
+        self.cancelled = False
+
+    def _chunk(self, method, offset, chunk):
+        def send():
+            self.server.requests.append((method, offset))
+            failure = self.server.failures.get(offset) if self.server.persistent else self.server.failures.pop(offset, None)
+            if failure == "lost":
+                raise ConnectionError("connection reset")
+            assert offset == len(self.received), f"{method} at offset {offset}, the server holds {len(self.received)} bytes"
+            self.received += chunk
+            if failure == "stored":
+                raise ConnectionError("read timed out")
+            if method == "finish_upload":
+                self.server.stored[self.url] = self.received
+        return Request(send)
+
+    def start_upload(self, upload_id, chunk):
+        return self._chunk("start_upload", 0, chunk)
+
+    def continue_upload(self, upload_id, offset, chunk):
+        return self._chunk("continue_upload", offset, chunk)
+
+    def finish_upload(self, upload_id, offset, chunk):
+        return self._chunk("finish_upload", offset, chunk)
+
+    def get_upload_status(self, upload_id):
+        return Request(lambda: type("UploadStatus", (), {"expected_content_range": f"{len(self.received)}-"}))
+
+    def cancel_upload(self, upload_id):
+        return Request(lambda: setattr(self, "cancelled", True))
+
+    def delete_object(self):
+        return Request(lambda: self.server.stored.pop(self.url))
+
+
+class FakeSharePointSession(SharePointSession):
+    """SharePointSession talking to a FakeServer instead of an authenticated ClientContext."""
+
+    def __init__(self, server):
+        self.server = server
+        self._lock = threading.Lock()
+        self.stats = {"handshakes": 0, "round_trips": 0, "bytes_down": 0, "bytes_up": 0}
+
+    @property
+    def context(self):
+        return self.server
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(sharepoint_session.time, "sleep", lambda seconds: None)
+
+
+def upload(server):
+    session = FakeSharePointSession(server)
+    session.upload_stream(FOLDER, "snapshot.xlsx", io.BytesIO(CONTENT), len(CONTENT), chunk_size=CHUNK)
+    return session
+
+
+def test_chunks_go_through_a_staging_file():
+    server = FakeServer({TARGET: b"previous"})
+    session = upload(server)
+    assert server.stored == {TARGET: CONTENT}
+    assert server.requests == [("start_upload", 0), ("continue_upload", 10), ("continue_upload", 20), ("continue_upload", 30), ("finish_upload", 40)]
+    assert session.stats["bytes_up"] == len(CONTENT)
+
+
+def test_failed_chunk_resumes_from_the_acknowledged_offset():
+    # The chunk at 10 is stored although its response is lost, the one at 30 never arrives
+    server = FakeServer({TARGET: b"previous"}, failures={10: "stored", 30: "lost"})
+    session = upload(server)
+    assert server.stored == {TARGET: CONTENT}
+    assert server.requests == [("start_upload", 0), ("continue_upload", 10), ("continue_upload", 20), ("continue_upload", 30),
+                               ("continue_upload", 30), ("finish_upload", 40)]
+    assert session.stats["bytes_up"] == len(CONTENT) - CHUNK
+
+
+def test_exhausted_retries_cancel_the_upload_and_keep_the_target():
+    server = FakeServer({TARGET: b"previous"}, failures={20: "lost"}, persistent=True)
+    with pytest.raises(ConnectionError):
+        upload(server)
+    assert server.requests.count(("continue_upload", 20)) == sharepoint_session.UPLOAD_CHUNK_RETRIES + 1
+    assert server.staging.cancelled
+    assert server.stored == {TARGET: b"previous"}
@@ -0,0 +1,149 @@
+import io
+import os
+
+import pandas as pd
+
+import pipeline
+from pfp_sidecar import sidecar_name, upload_sidecar
+from snapshot_manifest import MANIFEST_NAME, frame_checksum, load_manifest, rebuild_manifest, record_snapshot, snapshot_entry
+
+
+FOLDER = "/teams/Testing/Shared Documents/OLD PFP"
+
+
+def snapshot_name(date):
+    return f"Project Plan Analysis-continuous-{date}.xlsx"
+
+
+def frame(rows):
+    return pd.DataFrame({'Unique Code': [f"{i} - Employee{i}" for i in range(rows)], 'Project Number': range(rows), 'Employee Name': [f"Employee{i}" for i in range(rows)]})
+
+
+def xlsx_bytes(df):
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def publish(session, date, df, sidecar=True):
+    """Uploads a snapshot (and its sidecar) and records it, as PipelineRun.publish_snapshot does."""
+    name = snapshot_name(date)
+    session.upload(FOLDER, name, xlsx_bytes(df))
+    file_info = session.get_file_properties(f"{FOLDER}/{name}")
+    has_sidecar = sidecar and upload_sidecar(session, FOLDER, name, df, file_info["ETag"])
+    return record_snapshot(session, FOLDER, name, df, has_sidecar, file_info)
+
+
+def test_snapshot_entry_picks_latest_and_as_of():
+    manifest = {"latest": "2024-03-31", "snapshots": {date: {"name": snapshot_name(date)} for date in ("2024-01-31", "2024-02-29", "2024-03-31")}}
+    assert snapshot_entry(manifest)["date"] == "2024-03-31"
+    assert snapshot_entry(manifest, "2024-03-15")["date"] == "2024-02-29"
+    assert snapshot_entry(manifest, "2024-02-29")["date"] == "2024-02-29"
+    assert snapshot_entry(manifest, pd.Timestamp("2024-12-31").date())["date"] == "2024-03-31"
+    assert snapshot_entry(manifest, "2023-12-31") is None
+    assert snapshot_entry({"snapshots": {}}) is None
+
+
+def test_record_snapshot_adds_entries(session):
+    first = publish(session, "2024-01-31", frame(3))
+    publish(session, "2024-02-29", frame(5), sidecar=False)
+    manifest = load_manifest(session, FOLDER)
+    assert manifest["latest"] == "2024-02-29"
+    assert sorted(manifest["snapshots"]) == ["2024-01-31", "2024-02-29"]
+    assert first == manifest["snapshots"]["2024-01-31"]
+    assert (first["name"], first["rows"], first["checksum"]) == (snapshot_name("2024-01-31"), 3, frame_checksum(frame(3)))
+    assert first["sidecar"]["Name"] == sidecar_name(snapshot_name("2024-01-31"))
+    assert manifest["snapshots"]["2024-02-29"]["sidecar"] is None
+    assert record_snapshot(session, FOLDER, "Project Plan Analysis-columns-2024-03-31.xlsx", frame(1)) is None
+
+
+def test_rebuild_manifest_matches_recorded_entries(session):
+    publish(session, "2024-01-31", frame(3))
+    publish(session, "2024-02-29", frame(5), sidecar=False)
+    recorded = load_manifest(session, FOLDER)["snapshots"]
+    os.remove(session._path(f"{FOLDER}/{MANIFEST_NAME}"))
+    rebuilt = rebuild_manifest(session, FOLDER)
+    assert rebuilt["latest"] == "2024-02-29"
+    assert rebuilt["snapshots"] == recorded
+    assert load_manifest(session, FOLDER)["snapshots"] == recorded
+
+
+def test_lookup_uses_the_manifest_without_listing(session):
+    publish(session, "2024-01-31", frame(3))
+    publish(session, "2024-02-29", frame(5))
+    session.list_files = None
+    df = pipeline.fetch_latest_pfp_for_employee_remapping_to_create_gba_from_old_pfp(None, FOLDER, None, None, session=session)
+    assert len(df) == 5
+    df = pipeline.fetch_latest_pfp_for_employee_remapping_to_create_gba_from_old_pfp(None, FOLDER, None, None, session=session, as_of="2024-02-01")
+    assert len(df) == 3
+    # Nothing on or before as_of: the manifest is authoritative, the folder is not listed
+    assert pipeline.fetch_latest_pfp_for_employee_remapping_to_create_gba_from_old_pfp(None, FOLDER, None, None, session=session, as_of="2023-12-31") is None
+
+
+def test_replaced_workbook_is_noticed(session):
+    publish(session, "2024-01-31", frame(50))
+    loaded = pipeline.fetch_latest_pfp_for_employee_remapping_to_create_gba_from_old_pfp(None, FOLDER, None, None, session=session)
+    assert len(loaded) == 50
+    # Overwritten on the server: the manifest entry and the sidecar still describe the old workbook
+    session.upload(FOLDER, snapshot_name("2024-01-31"), xlsx_bytes(frame(1)))
+    df = pipeline.fetch_latest_pfp_for_employee_remapping_to_create_gba_from_old_pfp(None, FOLDER, None, None, session=session)
+    assert len(df) == 1
+
+
+def test_removed_workbook_falls_back_to_listing(session):
+    publish(session, "2024-01-31", frame(3))
+    publish(session, "2024-02-29", frame(5))
+    os.remove(session._path(f"{FOLDER}/{snapshot_name('2024-02-29')}"))
+    df = pipeline.fetch_latest_pfp_for_employee_remapping_to_create_gba_from_old_pfp(None, FOLDER, None, None, session=session)
+    assert len(df) == 3
+
+
+def test_failed_update_invalidates_the_manifest(session, monkeypatch):
+    publish(session, "2024-02-29", frame(5))
+    upload = session.upload
+
+    def upload_failing_manifest(folder_path, file_name, content):
+        if file_name == MANIFEST_NAME and b'"invalid"' not in content:
+            raise ConnectionError("connection reset")
+        return upload(folder_path, file_name, content)
+
+    monkeypatch.setattr(session, "upload", upload_failing_manifest)
+    assert publish(session, "2024-03-31", frame(7)) is None
+    assert load_manifest(session, FOLDER) is None
+    latest, _ = pipeline.find_snapshot(session, FOLDER)
+    assert latest["Name"] == snapshot_name("2024-03-31")
+    # The marker stays until the manifest is rebuilt: later updates do not start a partial one
+    monkeypatch.setattr(session, "upload", upload)
+    assert publish(session, "2024-04-30", frame(9)) is None
+    assert load_manifest(session, FOLDER) is None
+    assert sorted(rebuild_manifest(session, FOLDER)["snapshots"]) == ["2024-02-29", "2024-03-31", "2024-04-30"]
+    assert load_manifest(session, FOLDER)["latest"] == "2024-04-30"
+
+
+def test_unreadable_manifest_is_not_replaced(session, monkeypatch):
+    publish(session, "2024-01-31", frame(3))
+    publish(session, "2024-02-29", frame(5))
+    download = session.download
+
+    def download_failing_manifest(file_url):
+        if file_url.endswith(MANIFEST_NAME) and not session.failed:
+            session.failed = True
+            raise ConnectionError("connection reset")
+        return download(file_url)
+
+    session.failed = False
+    monkeypatch.setattr(session, "download", download_failing_manifest)
+    assert publish(session, "2024-03-31", frame(7)) is None
+    # Not a one-entry manifest: lookups list the folder and still see the earlier snapshots
+    latest, _ = pipeline.find_snapshot(session, FOLDER)
+    assert latest["Name"] == snapshot_name("2024-03-31")
+    earlier, _ = pipeline.find_snapshot(session, FOLDER, as_of="2024-02-01")
+    assert earlier["Name"] == snapshot_name("2024-01-31")
+
+
+def test_manifest_is_only_started_in_a_folder_without_snapshots(session):
+    session.upload(FOLDER, snapshot_name("2024-01-31"), xlsx_bytes(frame(3)))
+    assert publish(session, "2024-02-29", frame(5)) is None
+    assert not os.path.exists(session._path(f"{FOLDER}/{MANIFEST_NAME}"))
+    earlier, _ = pipeline.find_snapshot(session, FOLDER, as_of="2024-02-01")
+    assert earlier["Name"] == snapshot_name("2024-01-31")
@@ -0,0 +1,81 @@
+import json
+import os
+
+import pandas as pd
+
+from gba_publisher import publish_workbooks
+from pipeline import gba_publish_messages, upload_dataframe_to_sharepoint_folder
+from upload_fingerprints import FINGERPRINTS_NAME, UploadFingerprints, dataframe_fingerprint
+
+
+FOLDER = "/teams/Testing/Shared Documents/GBA Workbooks"
+
+
+def frame(hours=1.0):
+    return pd.DataFrame({'Oracle Date': ["2024-06-30"] * 3, 'Resource': ["A", "B", "C"], 'Hours': [hours, 2.0, 3.0]})
+
+
+def upload(session, name, df):
+    return upload_dataframe_to_sharepoint_folder(None, FOLDER, name, df, None, None, session=session)
+
+
+def test_unchanged_needs_fingerprint_etag_and_length(session):
+    df = frame()
+    assert upload(session, "a.xlsx", df) == "uploaded"
+    fingerprint = dataframe_fingerprint(df)
+    known = UploadFingerprints.load(session, FOLDER)
+    assert known.unchanged("a.xlsx", fingerprint)
+    assert not known.unchanged("a.xlsx", dataframe_fingerprint(frame(hours=9.0)))
+    assert not known.unchanged("b.xlsx", fingerprint)
+
+    for field in ("ETag", "Length"):
+        stale = UploadFingerprints(session, FOLDER, {"a.xlsx": dict(known.entries["a.xlsx"], **{field: "other"})}, known.server_files)
+        assert not stale.unchanged("a.xlsx", fingerprint)
+
+    # Replaced on the server: the recorded ETag no longer matches
+    session.upload(FOLDER, "a.xlsx", b"edited by hand")
+    assert not UploadFingerprints.load(session, FOLDER).unchanged("a.xlsx", fingerprint)
+
+
+def test_missing_fingerprints_file_means_nothing_is_known(session):
+    assert upload(session, "a.xlsx", frame()) == "uploaded"
+    assert upload(session, "a.xlsx", frame()) == "unchanged"
+    session.upload(FOLDER, FINGERPRINTS_NAME, b"not json")
+    assert UploadFingerprints.load(session, FOLDER).entries == {}
+    assert upload(session, "a.xlsx", frame()) == "uploaded"
+    assert "a.xlsx" in json.loads(session.download(f"{FOLDER}/{FINGERPRINTS_NAME}"))["files"]
+
+
+def test_retry_keeps_earlier_statuses(session):
+    frames = {"a.xlsx": frame(1.0), "b.xlsx": frame(2.0), "c.xlsx": frame(3.0)}
+    assert upload(session, "b.xlsx", frames["b.xlsx"]) == "uploaded"
+    first = publish_workbooks(session, FOLDER, {name: frames[name] for name in ("a.xlsx", "b.xlsx")}, serialize_workers=1)
+    assert {name: result["status"] for name, result in first.items()} == {"a.xlsx": "uploaded", "b.xlsx": "unchanged"}
+    first["c.xlsx"] = {"status": "failed", "error": "timeout", "attempts": 3, "bytes": 0}
+
+    results = publish_workbooks(session, FOLDER, frames, serialize_workers=1, previous_results=first)
+    assert {name: result["status"] for name, result in results.items()} == {"a.xlsx": "uploaded", "b.xlsx": "unchanged", "c.xlsx": "uploaded"}
+    messages = gba_publish_messages(results)
+    assert messages[0] == ("success", "2 GBA-wise DataFrames uploaded to SharePoint GBA Workbooks folder.")
+    assert messages[1][0] == "info" and messages[1][1].endswith(": b.xlsx")
+
+
+def test_single_upload_does_not_list_the_folder(session, monkeypatch):
+    def list_files(folder_path):
+        raise AssertionError("listed the folder")
+
+    monkeypatch.setattr(session, "list_files", list_files)
+    assert upload(session, "a.xlsx", frame()) == "uploaded"
+    assert upload(session, "a.xlsx", frame()) == "unchanged"
+    assert upload(session, "b.xlsx", frame()) == "uploaded"
+    # Only the entry of the file looked up is kept: the folder may hold any number of dated snapshots
+    assert list(json.loads(session.download(f"{FOLDER}/{FINGERPRINTS_NAME}"))["files"]) == ["b.xlsx"]
+    assert upload(session, "b.xlsx", frame()) == "unchanged"
+
+
+def test_entries_of_removed_files_are_dropped(session):
+    frames = {"a.xlsx": frame(1.0), "b.xlsx": frame(2.0)}
+    publish_workbooks(session, FOLDER, frames, serialize_workers=1)
+    os.remove(session._path(f"{FOLDER}/b.xlsx"))
+    publish_workbooks(session, FOLDER, {"a.xlsx": frame(3.0)}, serialize_workers=1)
+    assert list(json.loads(session.download(f"{FOLDER}/{FINGERPRINTS_NAME}"))["files"]) == ["a.xlsx"]
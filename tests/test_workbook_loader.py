@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+from synthetic_data import generate_checker, generate_pfp, write_workbook_structure
+from workbook_loader import LazyWorkbook, parse_sheet
+
+
+@pytest.fixture(scope="module")
+def workbook(tmp_path_factory):
+    """Workbook Structure bytes with 'Checker' (title row above the header), 'Dropdown' and filler sheets."""
+    _, employees = generate_pfp(500, seed=7)
+    checker = generate_checker(employees, seed=7)
+    path = tmp_path_factory.mktemp("workbook") / "Workbook Structure.xlsm"
+    write_workbook_structure(str(path), checker, filler_sheets=2, filler_rows=50, seed=7)
+    return path.read_bytes(), checker
+
+
+def test_load_parses_sheets_in_worker_processes(workbook):
+    content, checker = workbook
+    book = LazyWorkbook(content, "Workbook Structure.xlsm")
+    frames = book.load(["Checker", "Dropdown"], max_workers=2)
+    assert list(frames) == ["Checker", "Dropdown"]
+    assert sorted(book.parsed_sheets) == ["Checker", "Dropdown"]
+    assert list(frames["Checker"].columns) == list(checker.columns)
+    assert len(frames["Checker"]) == len(checker)
+    assert list(frames["Dropdown"].columns) == ["GBA"]
+    assert frames["Dropdown"]["GBA"].tolist() == ["MOB", "PLA", "RES", "EF", "SSC"]
+    pd.testing.assert_frame_equal(frames["Checker"], parse_sheet(content, "Checker"))
+    # Loaded sheets are kept: item access does not parse them again
+    assert book["Checker"] is frames["Checker"]
+
+
+def test_load_rejects_unknown_sheets(workbook):
+    content, _ = workbook
+    book = LazyWorkbook(content)
+    with pytest.raises(KeyError):
+        book.load(["Checker", "Missing"])
+    assert book.parsed_sheets == []
+    assert list(book.load(["Dropdown"])) == ["Dropdown"]
+    assert book.parsed_sheets == ["Dropdown"]
@@ -0,0 +1,102 @@
+import json
+from datetime import datetime, timezone
+
+from snapshot_manifest import frame_checksum
+
+
+FINGERPRINTS_NAME = "upload-fingerprints.json"
+
+
+def dataframe_fingerprint(df, ignore_columns=()):
+    """
+    frame_checksum of df without ignore_columns, e.g. a run-date stamp that changes on
+    every run although the data does not.
+    """
+    ignored = [col for col in ignore_columns if col in df.columns]
+    return frame_checksum(df.drop(columns=ignored) if ignored else df)
+
+
+class UploadFingerprints:
+    """
+    Fingerprints of the frames last uploaded to a folder, kept in upload-fingerprints.json
+    in that folder next to the file info (ETag, Length) each upload produced.
+
+    A file is unchanged when the fingerprint of the frame about to be uploaded matches and
+    the server copy still has the recorded ETag, so a workbook edited or replaced on the
+    server is uploaded again. Deleting the JSON file forces every upload. Entries are only
+    kept for files known to be on the server when the JSON is saved.
+    """
+
+    def __init__(self, session, folder_path, entries=None, server_files=None, file_names=None):
+        self.session = session
+        self.folder_path = folder_path
+        self.entries = entries or {}
+        self.server_files = server_files or {}
+        # None when server_files lists the whole folder, else the only files that were looked up
+        self.file_names = file_names
+
+    @classmethod
+    def load(cls, session, folder_path, file_names=None):
+        """
+        Reads the fingerprints and the file info of the folder (a listing, two requests), or
+        with file_names of those files only (one properties request each), which is all a
+        single upload to a large folder needs. A missing file or folder means nothing is known.
+        """
+        if file_names is None:
+            try:
+                server_files = {f["Name"]: f for f in session.list_files(folder_path)}
+            except Exception as e:
+                print(f"Could not list '{folder_path}' for upload fingerprints: {e}")
+                return cls(session, folder_path)
+            if FINGERPRINTS_NAME not in server_files:
+                return cls(session, folder_path, {}, server_files)
+        else:
+            server_files = {}
+            for file_name in file_names:
+                try:
+                    server_files[file_name] = session.get_file_properties(f"{folder_path}/{file_name}")
+                except Exception:
+                    # Not uploaded yet
+                    pass
+        entries = {}
+        try:
+            entries = json.loads(session.download(f"{folder_path}/{FINGERPRINTS_NAME}")).get("files", {})
+        except Exception as e:
+            # Without a listing a missing JSON file (no upload recorded yet) looks the same as an unreadable one
+            if file_names is None:
+                print(f"Ignoring unreadable upload fingerprints in '{folder_path}': {e}")
+        return cls(session, folder_path, entries, server_files, file_names)
+
+    def unchanged(self, file_name, fingerprint):
+        entry = self.entries.get(file_name)
+        server = self.server_files.get(file_name)
+        return (entry is not None and server is not None and entry.get("fingerprint") == fingerprint
+                and entry.get("ETag") == server.get("ETag") and entry.get("Length") == server.get("Length"))
+
+    def save(self, uploaded):
+        """
+        Records {file_name: fingerprint} for files just uploaded, with their new ETag, and writes
+        the JSON file. The file info comes from one listing, or for fingerprints loaded with
+        file_names from a properties request per uploaded file. Entries of files not on the
+        server (not listed, or not looked up) are dropped. Failures are reported and swallowed:
+        they only cost a re-upload next time.
+        """
+        if not uploaded:
+            return False
+        try:
+            if self.file_names is None:
+                self.server_files = {f["Name"]: f for f in self.session.list_files(self.folder_path)}
+            else:
+                for file_name in uploaded:
+                    self.server_files[file_name] = self.session.get_file_properties(f"{self.folder_path}/{file_name}")
+            self.entries = {name: entry for name, entry in self.entries.items() if name in self.server_files}
+            for file_name, fingerprint in uploaded.items():
+                server = self.server_files.get(file_name)
+                if server is not None:
+                    self.entries[file_name] = {"fingerprint": fingerprint, "ETag": server.get("ETag"), "Length": server.get("Length")}
+            content = {"updated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"), "files": self.entries}
+            self.session.upload(self.folder_path, FINGERPRINTS_NAME, json.dumps(content, indent=2, sort_keys=True).encode("utf-8"))
+            return True
+        except Exception as e:
+            print(f"Error saving upload fingerprints in '{self.folder_path}': {e}")
+            return False
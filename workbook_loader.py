@@ -0,0 +1,89 @@
+import io
+import os
+import threading
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from instrumentation import tracer
+
+
+def sheet_header_row(sheet_name):
+    """Workbook Structure sheets have a title row above the header, except 'Dropdown'."""
+    return 0 if sheet_name.lower() == "dropdown" else 1
+
+
+def parse_sheet(content, sheet_name):
+    """Parses a single sheet of the workbook bytes with the per-sheet header rule."""
+    return pd.read_excel(io.BytesIO(content), sheet_name=sheet_name, header=sheet_header_row(sheet_name), engine="openpyxl")
+
+
+class LazyWorkbook(Mapping):
+    """
+    Read-only {sheet name: DataFrame} mapping over workbook bytes downloaded once.
+
+    Sheet names come from the workbook index without parsing any rows, and each sheet
+    is parsed on first access and then kept. load() parses several sheets up front in
+    parallel across a process pool. source is the identity of the file the bytes came from
+    (see jobs.source_identity), used to key what is derived from the workbook.
+    """
+
+    def __init__(self, content, file_name=None, source=None):
+        self.content = content
+        self.file_name = file_name
+        self.source = source
+        self._frames = {}
+        self._sheet_names = None
+        self._lock = threading.Lock()
+
+    @property
+    def sheet_names(self):
+        if self._sheet_names is None:
+            from openpyxl import load_workbook
+
+            workbook = load_workbook(io.BytesIO(self.content), read_only=True, keep_links=False)
+            self._sheet_names = list(workbook.sheetnames)
+            workbook.close()
+        return self._sheet_names
+
+    @property
+    def parsed_sheets(self):
+        """Names of the sheets parsed so far."""
+        return list(self._frames)
+
+    def __getitem__(self, sheet_name):
+        if sheet_name not in self.sheet_names:
+            raise KeyError(sheet_name)
+        with self._lock:
+            if sheet_name not in self._frames:
+                with tracer.span("parse_sheet", sheet=sheet_name) as span:
+                    self._frames[sheet_name] = parse_sheet(self.content, sheet_name)
+                    span.rows = len(self._frames[sheet_name])
+            return self._frames[sheet_name]
+
+    def __contains__(self, sheet_name):
+        return sheet_name in self.sheet_names
+
+    def __iter__(self):
+        return iter(self.sheet_names)
+
+    def __len__(self):
+        return len(self.sheet_names)
+
+    def load(self, sheet_names, max_workers=None):
+        """
+        Parses the given sheets (those not parsed yet) in parallel worker processes
+        and returns {sheet name: DataFrame}. A single sheet is parsed in-process.
+        """
+        missing = [name for name in sheet_names if name not in self._frames]
+        unknown = [name for name in missing if name not in self.sheet_names]
+        if unknown:
+            raise KeyError(f"Sheets not found in workbook: {unknown}")
+        if len(missing) > 1:
+            workers = min(len(missing), max_workers or os.cpu_count() or 1)
+            with tracer.span("parse_sheets", sheets=", ".join(missing)), ProcessPoolExecutor(max_workers=workers) as pool:
+                frames = pool.map(parse_sheet, [self.content] * len(missing), missing)
+                with self._lock:
+                    self._frames.update(zip(missing, frames))
+        return {name: self[name] for name in sheet_names}